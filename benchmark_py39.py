@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memorie pentru get_student_data(all_modules=True) în serverul Python 3.9
+
+Un backend local servește răspunsuri de câțiva MB; fiecare scenariu rulează într-un
+proces separat, astfel încât vârful de RSS măsurat aparține unei singure cereri.
+"""
+
+import asyncio
+import gzip
+import json
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows: doar măsurătorile tracemalloc
+    resource = None
+
+SIZES_MB = (2, 8, 16)
+PROTOCOLS = ("2024-11-05", "2025-06-18")
+
+def build_payload(size_mb: int) -> bytes:
+    """Un răspuns all_modules de aproximativ size_mb MB"""
+    item_count = size_mb * 1024 * 1024 // 200
+    payload = {
+        "user_profile": {"user_id": 4001, "nume": "Benchmark", "judet": "București"},
+        "activitati_recente": [
+            {"id": i, "tip_activitate": "a_citit_materia", "materie_id": i % 7,
+             "titlu": f"Lecția {i} - capitolul {i % 40}", "detalii": "x" * 80}
+            for i in range(item_count)
+        ],
+        "profil_comportamental": {"scor": 0.75},
+        "progres_teorie": {"procent": 42},
+        "analiza_lacunelor": {"lacune": [{"id": i, "descriere": "lacună"} for i in range(100)]},
+        "utilizatori_compatibili": [{"user_id": 5000 + i} for i in range(10)],
+        "metadata": {"generated": time.time()}
+    }
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+class PayloadHandler(BaseHTTPRequestHandler):
+    """Backend local: același corp, comprimat gzip dacă clientul acceptă"""
+    protocol_version = "HTTP/1.1"
+    body = b"{}"
+    gzipped = b""
+
+    def do_GET(self):
+        body = self.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux raportează în KB, macOS în octeți
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+async def run_request(server, protocol: str) -> int:
+    """O cerere tools/call completă: backend -> cache -> rezultat -> mesaj JSON-RPC"""
+    await server.handle_message({
+        "jsonrpc": "2.0", "id": 0, "method": "initialize",
+        "params": {"protocolVersion": protocol}
+    })
+    message = await server.handle_message({
+        "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+        "params": {"name": "get_student_data", "arguments": {"user_id": 4001, "all_modules": True, "no_cache": True}}
+    })
+    return len(message)
+
+def child(size_mb: int, protocol: str) -> None:
+    """Un singur scenariu; rezultatul este tipărit ca JSON pe stdout"""
+    import server_py39
+
+    PayloadHandler.body = build_payload(size_mb)
+    PayloadHandler.gzipped = gzip.compress(PayloadHandler.body)
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), PayloadHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    server_py39.INTERNAL_API_BASE = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    server = server_py39.MCPServer()
+    server.register_tool("get_student_data", "Benchmark", {"properties": {}}, server_py39.get_student_data,
+                         output_schema={"type": "object"})
+
+    async def measure():
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        message_bytes = await run_request(server, protocol)
+        elapsed = time.perf_counter() - started
+        rss = peak_rss_mb() - baseline
+
+        # A doua rulare, cu tracemalloc: vârful alocărilor Python ale cererii
+        server_py39.invalidate_cache(4001)
+        tracemalloc.start()
+        await run_request(server, protocol)
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await server_py39.close_http_client()
+        return message_bytes, elapsed, rss, traced_peak
+
+    message_bytes, elapsed, rss, traced_peak = asyncio.run(measure())
+    stub.shutdown()
+    # Limita se aplică mesajului JSON-RPC scris pe stdout, nu doar rezultatului din el
+    assert message_bytes <= server_py39.MAX_RESULT_BYTES, (message_bytes, server_py39.MAX_RESULT_BYTES)
+    print(json.dumps({
+        "payload_mb": round(len(PayloadHandler.body) / (1024 * 1024), 2),
+        "wire_mb": round(len(PayloadHandler.gzipped) / (1024 * 1024), 2),
+        "message_mb": round(message_bytes / (1024 * 1024), 2),
+        "ms": round(elapsed * 1000, 1),
+        "peak_rss_mb": round(rss, 1),
+        "tracemalloc_peak_mb": round(traced_peak / (1024 * 1024), 1)
+    }))
+
+def main():
+    print("🧪 Benchmark memorie: get_student_data(all_modules=True) contra unui backend local")
+    print(f"{'protocol':<12}{'corp MB':>9}{'gzip MB':>9}{'mesaj MB':>10}{'ms':>9}{'RSS MB':>9}{'tracemalloc MB':>16}")
+    for protocol in PROTOCOLS:
+        for size_mb in SIZES_MB:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(size_mb), protocol],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{protocol:<12}{result['payload_mb']:>9}{result['wire_mb']:>9}{result['message_mb']:>10}"
+                  f"{result['ms']:>9}{result['peak_rss_mb']:>9}{result['tracemalloc_peak_mb']:>16}")
+    print("\nRSS = creșterea vârfului de memorie al procesului în timpul cererii (0 pe Windows)")
+    print("mesaj = octeții trimiși pe stdout; rămân sub ACADEMIADEPOLITIE_MAX_RESULT_BYTES (implicit 8 MB)")
+    print("la 2025-06-18 mesajul conține rezultatul de două ori (structuredContent + text, modul implicit \"full\")")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(int(sys.argv[2]), sys.argv[3])
+    else:
+        main()
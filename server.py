@@ -2,27 +2,214 @@
 """
 MCP Server pentru AcademiaDePolițe.com
 Conform documentației oficiale Model Context Protocol
+
+Logica comună (cache, reîncercări, limitare, proiecție, tool-urile) vine din
+server_py39.py, care folosește doar biblioteca standard; aici rămân transportul
+httpx și integrarea cu FastMCP.
 """
 
 import asyncio
+import functools
+import inspect
 import json
-import sys
+import os
 import httpx
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncIterator, Dict, List, Optional, Tuple
+from typing_extensions import TypedDict
 from mcp.server.fastmcp import FastMCP
-from mcp.types import Resource, Tool, TextContent
-from pydantic import BaseModel
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import CallToolResult, Resource, Tool, TextContent
+from pydantic import BaseModel, ConfigDict, with_config
 
-# Inițializare MCP server
-mcp = FastMCP("academiadepolitie")
+import server_py39 as core
+from server_py39 import (
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_TIMEOUT,
+    MAX_RESULT_BYTES,
+    STRUCTURED_OUTPUT,
+    VALIDATOR_HEADERS,
+    ApiResponse,
+    HTTPError,
+    _env_int,
+    dumps_result,
+    get_student_data,
+    get_students_data,
+    invalidate_cache,
+    invalidate_cache_tool,
+    progress_reporter,
+    response_cache,
+    set_api_transport,
+    truncate_result,
+)
 
-# Configurare API intern
-INTERNAL_API_BASE = "https://www.academiadepolitie.com/api/internal"
 DEFAULT_HEADERS = {
     "User-Agent": "MCP-Server/1.0",
     "Content-Type": "application/json"
 }
 
+# Configurare pool HTTP - clientul trăiește cât serverul MCP
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=_env_int("ACADEMIADEPOLITIE_HTTP_MAX_KEEPALIVE", 10),
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+)
+
+# HTTP/2 necesită pachetul opțional 'h2' (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.environ.get("ACADEMIADEPOLITIE_HTTP2", "1") != "0"
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returnează clientul HTTP partajat (creat la primul apel)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            limits=HTTP_POOL_LIMITS,
+            timeout=HTTP_TIMEOUT,
+            http2=HTTP2_ENABLED
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """Închide clientul HTTP partajat și conexiunile din pool"""
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+async def request_internal_api_once(params: Dict[str, Any], validators: Optional[Dict[str, str]] = None) -> ApiResponse:
+    """O singură cerere HTTP către API-ul intern prin httpx; condiționată dacă primește validatori
+
+    Erorile httpx sunt traduse în cele pe care le clasifică nucleul comun:
+    HTTPError pentru status >= 400, ConnectionError pentru conectare/rețea,
+    asyncio.TimeoutError pentru timeout-urile de citire/scriere. PoolTimeout
+    rămâne neschimbat: pool-ul plin nu este o defecțiune a API-ului.
+    """
+    headers = {
+        conditional: validators[name]
+        for name, conditional in VALIDATOR_HEADERS
+        if validators and name in validators
+    }
+    url = f"{core.INTERNAL_API_BASE}/profile_for_conversation.php"
+    try:
+        response = await get_http_client().get(url, params=params, headers=headers)
+    except httpx.PoolTimeout:
+        raise
+    except (httpx.ConnectTimeout, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+        raise ConnectionError(str(e) or type(e).__name__) from e
+    except httpx.TimeoutException as e:
+        raise asyncio.TimeoutError(str(e) or type(e).__name__) from e
+    received = {name: response.headers[name] for name, _ in VALIDATOR_HEADERS if name in response.headers}
+    if response.status_code == 304 and validators:
+        return ApiResponse(None, {**validators, **received}, not_modified=True)
+    if response.status_code >= 400:
+        raise HTTPError(response.status_code, response.reason_phrase, dict(response.headers))
+    # Parsare direct din octeți; răspunsul httpx nu mai este păstrat după return
+    return ApiResponse(json.loads(response.content), received)
+
+set_api_transport(request_internal_api_once)
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
+    """Ciclul de viață al serverului: pool-ul HTTP se închide la oprire"""
+    get_http_client()
+    try:
+        yield {}
+    finally:
+        await close_http_client()
+        if response_cache.disk is not None:
+            response_cache.disk.close()
+
+# Inițializare MCP server
+mcp = FastMCP("academiadepolitie", lifespan=server_lifespan)
+
+async def call_with_progress(func, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Rulează tool-ul cu progress_reporter legat de cererea MCP curentă"""
+    # report_progress nu trimite nimic dacă clientul nu a cerut progres (progressToken)
+    token = progress_reporter.set(mcp.get_context().report_progress)
+    try:
+        return await func(**arguments)
+    finally:
+        progress_reporter.reset(token)
+
+# Loc rezervat în MAX_RESULT_BYTES pentru anvelopa JSON-RPC și câmpurile CallToolResult
+RESULT_ENVELOPE_BYTES = 256
+
+def limit_result(result: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """Rezultatul, scurtat dacă mesajul trimis ar depăși MAX_RESULT_BYTES, și textul lui JSON
+
+    Se măsoară textul produs oricum pentru client: în mesaj rezultatul apare ca text
+    (șir JSON, cu ghilimelele scăpate), în structuredContent sau, în modul "full", în ambele.
+    """
+    limit = MAX_RESULT_BYTES - RESULT_ENVELOPE_BYTES
+    
+    def message_bytes(text: str) -> Tuple[int, int]:
+        size = len(text.encode("utf-8"))
+        as_string = size + text.count('"') + text.count("\\") + text.count("\n")
+        if STRUCTURED_OUTPUT == "off":
+            return size, as_string
+        if STRUCTURED_OUTPUT == "structured":
+            return size, size
+        return size, size + as_string
+    
+    text = dumps_result(result)
+    size, total = message_bytes(text)
+    if total <= limit:
+        return result, text
+    budget = limit * size // total
+    while True:
+        truncated = truncate_result(result, budget)
+        text = dumps_result(truncated)
+        size, total = message_bytes(text)
+        if total <= limit or "error" in truncated:
+            return truncated, text
+        budget = min(budget - 1, budget * limit // total)
+
+def structured_tool(output_type: Any, name: Optional[str] = None):
+    """Înregistrează funcția ca tool MCP cu rezultat structurat (outputSchema din output_type)
+
+    Rezultatul este trimis în structuredContent și, implicit, ca text JSON (pentru
+    clienții care citesc doar content), deci de două ori în același mesaj; funcția
+    rămâne apelabilă direct și întoarce în continuare dicționarul obișnuit.
+    """
+    def decorator(func):
+        if STRUCTURED_OUTPUT == "off":
+            @functools.wraps(func)
+            async def plain_tool(**arguments) -> str:
+                # Textul măsurat este chiar cel trimis; FastMCP nu îl mai serializează
+                return limit_result(await call_with_progress(func, arguments))[1]
+            
+            mcp.tool(name=name, structured_output=False)(plain_tool)
+            return func
+        
+        @functools.wraps(func)
+        async def tool(**arguments) -> CallToolResult:
+            result = await call_with_progress(func, arguments)
+            if "error" in result:
+                raise ToolError(result["error"])
+            result, text = limit_result(result)
+            if "error" in result:
+                raise ToolError(result["error"])
+            if STRUCTURED_OUTPUT == "structured":
+                text = f"Rezultat structurat în structuredContent (chei: {', '.join(result)})"
+            return CallToolResult(content=[TextContent(type="text", text=text)], structuredContent=result)
+        
+        tool.__signature__ = inspect.signature(func).replace(
+            return_annotation=Annotated[CallToolResult, output_type]
+        )
+        mcp.tool(name=name, structured_output=True)(tool)
+        return func
+    return decorator
+
 class UserProfileRequest(BaseModel):
     user_id: int
     materie: Optional[int] = None
@@ -35,148 +222,83 @@ class PerformanceRequest(BaseModel):
     user_id: int
     materie: Optional[int] = None
 
-async def call_internal_api(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    """Cheamă API-ul intern cu parametrii specificați"""
-    async with httpx.AsyncClient() as client:
-        try:
-            url = f"{INTERNAL_API_BASE}/profile_for_conversation.php"
-            response = await client.get(url, params=params, headers=DEFAULT_HEADERS, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            return {"error": f"API call failed: {str(e)}"}
-
-@mcp.tool()
-async def get_student_data(
-    user_id: int,
-    user_profile: bool = False,
-    activitati_recente: Optional[int] = None,
-    profil_comportamental: bool = False,
-    progres_teorie: bool = False,
-    analiza_lacunelor: bool = False,
-    utilizatori_compatibili: Optional[int] = None,
-    materie: Optional[int] = None,
-    only: Optional[str] = None,
-    focus: Optional[str] = None,
-    instructiuni_llm: bool = False,
-    all_modules: bool = False
-) -> Dict[str, Any]:
-    """
-    Obține datele studentului conform API-ului modular intern
-    
-    Args:
-        user_id: ID-ul utilizatorului (obligatoriu)
-        user_profile: Include profilul utilizatorului (True/False)
-        activitati_recente: Numărul de activități recente de returnat (1-10). 
-                           Exemplu: 1=ultima activitate, 5=ultimele 5 activități, 10=ultimele 10 activități
-        profil_comportamental: Include profilul comportamental (necesită materie)
-        progres_teorie: Include progresul la teorie (True/False)
-        analiza_lacunelor: Include analiza lacunelor (True/False)
-        utilizatori_compatibili: Numărul de utilizatori compatibili (1-10) pentru peer matching și colaborare
-        materie: ID-ul materiei pentru filtrare (opțional)
-        only: Filtrare pe tip activitate: 'a_simulat_examenul', 'are_lacune_de_clarificat', 
-              'a_citit_materia', 's_a_testat_pe_lectie_capitol', 'a_notat_la_lectii', 
-              'are_provocari_sustinute', 'este_in_eroare_la'
-        focus: Pentru utilizatori_compatibili - filtrare geografică/temporală: 'toate', 'judet', 'an_admitere', 'judet_si_an'
-        instructiuni_llm: Transformă recomandările în instrucțiuni pentru LLM (True/False)
-        all_modules: Include toate modulele disponibile (True/False)
-    
-    Returns:
-        Datele studentului conform modulelor solicitate
-        
-    Examples:
-        - get_student_data(4001, user_profile=True) → doar profilul
-        - get_student_data(4001, activitati_recente=1) → ultima activitate
-        - get_student_data(4001, activitati_recente=5, only="a_simulat_examenul") → ultimele 5 simulări
-        - get_student_data(4001, utilizatori_compatibili=3, focus="judet") → 3 utilizatori compatibili din același județ
-        - get_student_data(4001, activitati_recente=3, instructiuni_llm=True) → activități cu instrucțiuni LLM
-        - get_student_data(4001, all_modules=True) → toate datele
-    """
-    # Construiește parametrii conform API-ului intern
-    params = {"user_id": user_id}
-    
-    if all_modules:
-        params["all"] = 1
-    else:
-        if user_profile:
-            params["user_profile"] = 1
-        if activitati_recente is not None:
-            params["activitati_recente"] = min(max(activitati_recente, 1), 10)
-        if profil_comportamental:
-            params["profil_comportamental"] = 1
-        if progres_teorie:
-            params["progres_teorie"] = 1
-        if analiza_lacunelor:
-            params["analiza_lacunelor"] = 1
-        if utilizatori_compatibili is not None:
-            params["utilizatori_compatibili"] = min(max(utilizatori_compatibili, 1), 10)
-        if instructiuni_llm:
-            params["instructiuni_llm"] = 1
-    
-    if materie:
-        params["materie"] = materie
-    
-    if focus:
-        # Validează valorile permise pentru 'focus'
-        valid_focus_values = ["toate", "judet", "an_admitere", "judet_si_an"]
-        if focus in valid_focus_values:
-            params["focus"] = focus
-    
-    if only:
-        # Validează valorile permise pentru 'only'
-        valid_only_values = [
-            "a_citit_materia",
-            "a_simulat_examenul", 
-            "s_a_testat_pe_lectie_capitol",
-            "are_lacune_de_clarificat",
-            "a_notat_la_lectii",
-            "are_provocari_sustinute",
-            "este_in_eroare_la"
-        ]
-        if only in valid_only_values:
-            params["only"] = only
-    
-    result = await call_internal_api("modular", params)
-    
-    if "error" in result:
-        return {"error": result["error"]}
-    
-    return {
-        "tool": "get_student_data",
-        "user_id": user_id,
-        "modules_requested": {
-            "user_profile": user_profile,
-            "activitati_recente": activitati_recente,
-            "profil_comportamental": profil_comportamental,
-            "progres_teorie": progres_teorie,
-            "analiza_lacunelor": analiza_lacunelor,
-            "utilizatori_compatibili": utilizatori_compatibili,
-            "instructiuni_llm": instructiuni_llm,
-            "all_modules": all_modules
-        },
-        "filters": {
-            "materie": materie,
-            "only": only,
-            "focus": focus
-        },
-        "data": result,
-        "metadata": result.get("metadata", {})
-    }
+# Schema rezultatelor structurate: câte o cheie pentru fiecare modul al API-ului;
+# forma internă a modulelor rămâne cea trimisă de backend
+@with_config(ConfigDict(extra="allow"))
+class StudentModules(TypedDict, total=False):
+    user_profile: Any
+    activitati_recente: Any
+    profil_comportamental: Any
+    progres_teorie: Any
+    analiza_lacunelor: Any
+    utilizatori_compatibili: Any
+    metadata: Dict[str, Any]
+
+class FieldsReport(TypedDict):
+    requested: List[str]
+    missing: List[str]
+
+class TruncationReport(TypedDict):
+    max_bytes: int
+    original_bytes: int
+    max_list_items: int
+
+class _StudentDataOptional(TypedDict, total=False):
+    fields: FieldsReport
+    truncated: TruncationReport
+
+class StudentDataResult(_StudentDataOptional):
+    tool: str
+    user_id: int
+    modules_requested: Dict[str, Any]
+    filters: Dict[str, Any]
+    data: StudentModules
+    metadata: Dict[str, Any]
+
+class _StudentsDataOptional(TypedDict, total=False):
+    truncated: TruncationReport
+
+class StudentsDataResult(_StudentsDataOptional):
+    tool: str
+    user_ids: List[int]
+    results: Dict[str, StudentDataResult]
+    errors: Dict[str, str]
+    metadata: Dict[str, Any]
 
-# Tool-urile de mai sus sunt înlocuite cu get_student_data modular
+class InvalidateCacheResult(TypedDict):
+    tool: str
+    user_id: Optional[int]
+    invalidated: int
+
+# Tool-urile comune, cu rezultatul structurat descris de tipurile de mai sus
+structured_tool(StudentDataResult)(get_student_data)
+structured_tool(StudentsDataResult)(get_students_data)
+structured_tool(InvalidateCacheResult, name="invalidate_cache")(invalidate_cache_tool)
 
 @mcp.resource("user://profile/{user_id}")
 async def get_user_profile_resource(user_id: int) -> str:
     """Resource pentru profilul utilizatorului"""
     result = await get_student_data(user_id, user_profile=True)
-    return json.dumps(result, indent=2, ensure_ascii=False)
+    return dumps_result(result)
 
 @mcp.resource("user://data/{user_id}")
 async def get_user_complete_data_resource(user_id: int) -> str:
     """Resource pentru toate datele utilizatorului"""
     result = await get_student_data(user_id, all_modules=True)
-    return json.dumps(result, indent=2, ensure_ascii=False)
+    return dumps_result(result)
+
+def get_metrics() -> Dict[str, Any]:
+    """Instantaneu al metricilor serverului (reîncercări, serializare și cache)"""
+    # Transferul HTTP și stdout sunt măsurate doar de serverul stdlib
+    metrics = core.get_metrics()
+    del metrics["transfer"], metrics["stdout"]
+    return metrics
+
+@mcp.resource("server://metrics")
+async def get_metrics_resource() -> str:
+    """Resource pentru metricile serverului"""
+    return dumps_result(get_metrics())
 
 if __name__ == "__main__":
     # Rulează serverul MCP prin stdio
-    mcp.run()
\ No newline at end of file
+    mcp.run()
@@ -5,12 +5,20 @@ Implementează protocolul Model Context Protocol manual
 """
 
 import asyncio
+import contextvars
+import email.utils
 import json
+import os
+import random
+import sqlite3
+import ssl
 import sys
-import urllib.request
+import time
 import urllib.parse
-import urllib.error
-from typing import Any, Dict, List, Optional, Union
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
 
 # Configurare API intern
 INTERNAL_API_BASE = "https://www.academiadepolitie.com/api/internal"
@@ -22,12 +30,281 @@ DEFAULT_HEADERS = {
 # Token JWT - va fi setat din variabila de mediu sau config
 JWT_TOKEN = None
 
+def _env_int(name: str, default: int) -> int:
+    """Citește o valoare întreagă din variabilele de mediu"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    """Citește o valoare reală din variabilele de mediu"""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+# Configurare transport HTTP (asyncio nativ, conexiuni persistente)
+HTTP_TIMEOUT = _env_float("ACADEMIADEPOLITIE_HTTP_TIMEOUT", 30.0)
+HTTP_MAX_CONNECTIONS = _env_int("ACADEMIADEPOLITIE_HTTP_MAX_CONNECTIONS", 10)
+HTTP_KEEPALIVE_EXPIRY = _env_float("ACADEMIADEPOLITIE_HTTP_KEEPALIVE_EXPIRY", 60.0)
+HTTP_MAX_REDIRECTS = 5
+HTTP_READ_CHUNK = 64 * 1024
+# Limita corpului decodat al unui răspuns de la API (protecție de memorie)
+HTTP_MAX_BODY_BYTES = _env_int("ACADEMIADEPOLITIE_HTTP_MAX_BODY_BYTES", 64 * 1024 * 1024)
+
+# Configurare cache răspunsuri: TTL (secunde) per modul, suprascris prin
+# ACADEMIADEPOLITIE_CACHE_TTL_<MODUL>; un răspuns combinat expiră la
+# cel mai mic TTL dintre modulele incluse
+CACHE_ENABLED = os.environ.get("ACADEMIADEPOLITIE_CACHE", "1") != "0"
+CACHE_MAX_ENTRIES = _env_int("ACADEMIADEPOLITIE_CACHE_MAX_ENTRIES", 1024)
+MODULE_TTL = {
+    name: _env_float(f"ACADEMIADEPOLITIE_CACHE_TTL_{name.upper()}", default)
+    for name, default in {
+        "user_profile": 600.0,
+        "activitati_recente": 30.0,
+        "profil_comportamental": 300.0,
+        "progres_teorie": 120.0,
+        "analiza_lacunelor": 300.0,
+        "utilizatori_compatibili": 600.0,
+    }.items()
+}
+
+# Cache persistent pe disc (SQLite), opțional: "1" folosește directorul de
+# instalare, orice altă valoare este calea fișierului; gol sau "0" = dezactivat
+DISK_CACHE_SETTING = os.environ.get("ACADEMIADEPOLITIE_DISK_CACHE", "")
+DISK_CACHE_PATH = (
+    os.path.join(os.path.expanduser("~"), ".academiadepolitie-mcp", "cache.sqlite3")
+    if DISK_CACHE_SETTING == "1" else DISK_CACHE_SETTING if DISK_CACHE_SETTING not in ("", "0") else None
+)
+DISK_CACHE_MAX_BYTES = _env_int("ACADEMIADEPOLITIE_DISK_CACHE_MAX_BYTES", 50 * 1024 * 1024)
+
+# Stale-while-revalidate: cât timp după expirare (secunde) un modul mai poate
+# fi servit imediat, cu reîmprospătare în fundal; peste această limită cererea
+# așteaptă răspunsul API. Suprascris prin ACADEMIADEPOLITIE_CACHE_MAX_STALE_<MODUL>
+MODULE_MAX_STALE = {
+    name: _env_float(f"ACADEMIADEPOLITIE_CACHE_MAX_STALE_{name.upper()}", default)
+    for name, default in {
+        "user_profile": 3600.0,
+        "activitati_recente": 60.0,
+        "profil_comportamental": 1800.0,
+        "progres_teorie": 1800.0,
+        "analiza_lacunelor": 1800.0,
+        "utilizatori_compatibili": 3600.0,
+    }.items()
+}
+
+# La o cerere activitati_recente=N (N mai mic) se aduce direct fereastra
+# maximă: costă tot un apel, iar variantele mai înguste (N mai mic, 'only',
+# 'materie') se servesc apoi local. 0 dezactivează lărgirea.
+ACTIVITIES_PREFETCH_WINDOW = min(_env_int("ACADEMIADEPOLITIE_ACTIVITIES_PREFETCH", 10), 10)
+
+# all_modules ca cereri paralele pe module în loc de un singur apel all=1:
+# latența devine cea a celui mai lent modul, iar clientul primește progres
+ALL_MODULES_FANOUT = os.environ.get("ACADEMIADEPOLITIE_ALL_MODULES_FANOUT", "0") == "1"
+
+# Reîncercări pentru erorile tranzitorii ale API-ului (cererile GET sunt idempotente):
+# backoff exponențial cu jitter, Retry-After respectat până la RETRY_AFTER_MAX secunde
+RETRY_ATTEMPTS = max(_env_int("ACADEMIADEPOLITIE_RETRY_ATTEMPTS", 3), 1)
+RETRY_BACKOFF_BASE = _env_float("ACADEMIADEPOLITIE_RETRY_BACKOFF_BASE", 0.25)
+RETRY_BACKOFF_MAX = _env_float("ACADEMIADEPOLITIE_RETRY_BACKOFF_MAX", 4.0)
+RETRY_AFTER_MAX = _env_float("ACADEMIADEPOLITIE_RETRY_AFTER_MAX", 10.0)
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Circuit breaker: după BREAKER_FAILURE_THRESHOLD eșecuri consecutive cererile eșuează
+# imediat; după BREAKER_RESET_TIMEOUT secunde o singură cerere de probă verifică API-ul
+BREAKER_FAILURE_THRESHOLD = max(_env_int("ACADEMIADEPOLITIE_BREAKER_FAILURES", 5), 1)
+BREAKER_RESET_TIMEOUT = _env_float("ACADEMIADEPOLITIE_BREAKER_RESET", 30.0)
+
+# Limitarea cererilor către API: token bucket (API_RATE_LIMIT cereri/s, rafale de
+# API_RATE_BURST; 0 dezactivează) și o limită de concurență adaptivă (AIMD) între
+# API_CONCURRENCY_MIN și API_CONCURRENCY_MAX, redusă când latența recentă
+# depășește de API_LATENCY_TOLERANCE ori media pe termen lung
+API_RATE_LIMIT = _env_float("ACADEMIADEPOLITIE_API_RATE_LIMIT", 20.0)
+API_RATE_BURST = max(_env_int("ACADEMIADEPOLITIE_API_RATE_BURST", 20), 1)
+API_CONCURRENCY_MIN = max(_env_int("ACADEMIADEPOLITIE_API_CONCURRENCY_MIN", 1), 1)
+API_CONCURRENCY_MAX = max(_env_int("ACADEMIADEPOLITIE_API_CONCURRENCY_MAX", HTTP_MAX_CONNECTIONS), API_CONCURRENCY_MIN)
+API_LATENCY_TOLERANCE = _env_float("ACADEMIADEPOLITIE_API_LATENCY_TOLERANCE", 2.0)
+
+# Cereri hedged: dacă API-ul nu a răspuns până la percentila HEDGE_PERCENTILE a
+# latenței recente, pleacă o a doua cerere GET identică și câștigă primul răspuns.
+# Cererea suplimentară consumă din bugetul limitatorului. 0 dezactivează (implicit)
+HEDGE_PERCENTILE = min(max(_env_float("ACADEMIADEPOLITIE_HEDGE_PERCENTILE", 0.0), 0.0), 99.9)
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+# Tool-ul get_students_data: număr maxim de utilizatori și cereri simultane
+BATCH_MAX_USERS = _env_int("ACADEMIADEPOLITIE_BATCH_MAX_USERS", 50)
+BATCH_CONCURRENCY = _env_int("ACADEMIADEPOLITIE_BATCH_CONCURRENCY", 4)
+
+# Câmpurile din fiecare activitate după care se filtrează local 'only' / 'materie'
+ACTIVITY_FILTER_FIELDS = {
+    "only": "tip_activitate",
+    "materie": "materie_id"
+}
+
+# Numărul maxim de cereri JSON-RPC procesate simultan
+MAX_CONCURRENT_REQUESTS = _env_int("ACADEMIADEPOLITIE_MAX_CONCURRENT_REQUESTS", 8)
+# Mărimea maximă a mesajului cu rezultatul unui tool, în octeții trimiși clientului;
+# peste ea listele din date sunt scurtate și rezultatul este marcat cu "truncated"
+MAX_RESULT_BYTES = _env_int("ACADEMIADEPOLITIE_MAX_RESULT_BYTES", 8 * 1024 * 1024)
+# Octeți de răspuns în așteptare spre stdout peste care cererile noi așteaptă
+STDOUT_BUFFER_BYTES = _env_int("ACADEMIADEPOLITIE_STDOUT_BUFFER", 1024 * 1024)
+
+# Ieșirea JSON către client: "compact" (implicit) sau "pretty" (indentat);
+# orjson este folosit automat dacă este instalat
+JSON_OUTPUT = os.environ.get("ACADEMIADEPOLITIE_JSON_OUTPUT", "compact").lower()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class SerializationStats:
+    """Mărimea și durata serializării rezultatelor trimise clientului"""
+    def __init__(self):
+        self.count = 0
+        self.output_chars = 0
+        self.seconds = 0.0
+        self.last: Dict[str, Any] = {}
+
+    def record(self, chars: int, seconds: float) -> None:
+        self.count += 1
+        self.output_chars += chars
+        self.seconds += seconds
+        self.last = {"output_chars": chars, "serialize_ms": round(seconds * 1000, 3)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": JSON_OUTPUT,
+            "encoder": "orjson" if orjson is not None else "json",
+            "count": self.count,
+            "output_chars": self.output_chars,
+            "serialize_ms": round(self.seconds * 1000, 3),
+            "last": self.last
+        }
+
+serialization_stats = SerializationStats()
+
+def dumps_result(result: Any) -> str:
+    """Serializează un rezultat pentru client, conform modului de ieșire configurat"""
+    started = time.perf_counter()
+    pretty = JSON_OUTPUT == "pretty"
+    text = None
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            text = orjson.dumps(result, option=option).decode("utf-8")
+        except TypeError:
+            text = None  # tip neacceptat de orjson: se folosește json
+    if text is None:
+        if pretty:
+            text = json.dumps(result, indent=2, ensure_ascii=False)
+        else:
+            text = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    serialization_stats.record(len(text), time.perf_counter() - started)
+    return text
+
+def encode_message(message: Any) -> bytes:
+    """Serializează un mesaj JSON-RPC pentru stdout: compact, cu UTF-8 nescăpat (fără \\uXXXX)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # tip neacceptat de orjson: se folosește json
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _data_lists(value: Any, in_data: bool = False) -> List[List[Any]]:
+    """Listele cele mai exterioare din "data", singurele care se scurtează"""
+    if isinstance(value, dict):
+        return [found for key, item in value.items() for found in _data_lists(item, in_data or key == "data")]
+    if isinstance(value, list):
+        return [value] if in_data else [found for item in value for found in _data_lists(item, in_data)]
+    return []
+
+def _cap_lists(value: Any, max_items: int, in_data: bool = False) -> Any:
+    """Copie superficială în care listele din "data" păstrează cel mult max_items elemente"""
+    if isinstance(value, dict):
+        return {key: _cap_lists(item, max_items, in_data or key == "data") for key, item in value.items()}
+    if isinstance(value, list):
+        return value[:max_items] if in_data else [_cap_lists(item, max_items, in_data) for item in value]
+    return value
+
+def truncate_result(result: Dict[str, Any], max_bytes: int = MAX_RESULT_BYTES) -> Dict[str, Any]:
+    """Scurtează listele din datele rezultatului până când JSON-ul încape în max_bytes
+
+    Mărimea fiecărui element se măsoară o singură dată, cu encode_message (aceiași
+    octeți ca la scriere); numărul maxim de elemente per listă se alege din aceste
+    mărimi, iar rezultatul final se verifică.
+    Rezultatul rămâne JSON valid și primește cheia "truncated" cu detaliile tăierii.
+    """
+    original_bytes = len(encode_message(result))
+    if original_bytes <= max_bytes:
+        return result
+    
+    # Octeții fiecărui element, cu separatorul ","; măsurați cu encoderul mesajelor
+    item_sizes = [[len(encode_message(item)) + 1 for item in items] for items in _data_lists(result)]
+    marker = {"max_bytes": max_bytes, "original_bytes": original_bytes, "max_list_items": 0}
+    marker_bytes = len(encode_message({"truncated": marker})) + 16
+    
+    def estimated_bytes(max_items: int) -> int:
+        return original_bytes + marker_bytes - sum(sum(sizes[max_items:]) for sizes in item_sizes)
+    
+    low, high = 0, max((len(sizes) for sizes in item_sizes), default=0)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimated_bytes(middle) <= max_bytes:
+            low = middle
+        else:
+            high = middle - 1
+    
+    max_items = low
+    while True:
+        truncated = _cap_lists(result, max_items)
+        truncated["truncated"] = {**marker, "max_list_items": max_items}
+        size = len(encode_message(truncated))
+        if size <= max_bytes:
+            return truncated
+        if max_items == 0:
+            return {"error": f"Rezultat prea mare ({original_bytes} octeți, limita {max_bytes}); "
+                             f"folosește fields sau mai puține module"}
+        # Estimarea a fost prea optimistă: se reduce proporțional cu depășirea
+        max_items = min(max_items - 1, max_items * max_bytes // size)
+
+# Versiuni MCP acceptate la initialize (cea mai nouă prima); rezultatele
+# structurate (structuredContent + outputSchema) există din 2025-06-18
+SUPPORTED_PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+STRUCTURED_OUTPUT_VERSION = "2025-06-18"
+# "full" (implicit): structuredContent și, conform specificației, același JSON ca text
+# (rezultatul apare de două ori, deci mesajul are aproape dublul octeților);
+# "structured": doar structuredContent + un text scurt, pentru clienții care îl citesc;
+# "off": doar text, ca pentru clienții vechi
+STRUCTURED_OUTPUT = os.environ.get("ACADEMIADEPOLITIE_STRUCTURED_OUTPUT", "full").lower()
+# Metode al căror rezultat depinde doar de tool-urile/resursele înregistrate
+STATIC_METHODS = ("initialize", "tools/list", "resources/list")
+
 class MCPServer:
     def __init__(self):
         self.tools = {}
         self.resources = {}
+        self.protocol_version = SUPPORTED_PROTOCOL_VERSIONS[-1]
+        # Tabela de dispecerizare: metodă JSON-RPC -> handler(params) -> result;
+        # tools/call se tratează separat, rezultatul fiind codificat direct în mesaj
+        self.handlers = {
+            "initialize": self.initialize,
+            "tools/list": self.list_tools,
+            "resources/list": self.list_resources,
+            "resources/read": self.read_resource,
+            "notifications/cancelled": self.cancel_notification
+        }
+        # Cererile în desfășurare, după id, pentru notifications/cancelled
+        self.running: Dict[Union[str, int], asyncio.Task] = {}
+        self.static_results: Dict[Tuple[str, str], bytes] = {}
+        # Trimite o notificare către client (setat de main, odată cu ieșirea stdout)
+        self.notify: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
         
-    def register_tool(self, name: str, description: str, parameters: Dict[str, Any], handler):
+    def register_tool(self, name: str, description: str, parameters: Dict[str, Any], handler,
+                      output_schema: Optional[Dict[str, Any]] = None):
         """Înregistrează un tool MCP"""
         self.tools[name] = {
             "name": name,
@@ -37,8 +314,53 @@ class MCPServer:
                 "properties": parameters.get("properties", {}),
                 "required": parameters.get("required", [])
             },
+            "outputSchema": output_schema,
             "handler": handler
         }
+        self.static_results.clear()
+    
+    def describe_tool(self, tool_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Descrierea unui tool pentru tools/list"""
+        description = {
+            "name": tool_info["name"],
+            "description": tool_info["description"],
+            "inputSchema": tool_info["inputSchema"]
+        }
+        if self.structured_output and tool_info["outputSchema"]:
+            description["outputSchema"] = tool_info["outputSchema"]
+        return description
+    
+    @property
+    def structured_output(self) -> bool:
+        """Clientul a negociat o versiune MCP cu rezultate structurate"""
+        return STRUCTURED_OUTPUT != "off" and self.protocol_version >= STRUCTURED_OUTPUT_VERSION
+    
+    def tool_result(self, result: Any, output_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Construiește rezultatul tools/call: structurat sau doar text JSON"""
+        if not (self.structured_output and output_schema and isinstance(result, dict)):
+            return {"content": [{"type": "text", "text": dumps_result(result)}]}
+        if "error" in result:
+            return {"content": [{"type": "text", "text": str(result["error"])}], "isError": True}
+        if STRUCTURED_OUTPUT == "structured":
+            text = f"Rezultat structurat în structuredContent (chei: {', '.join(result)})"
+        else:
+            text = dumps_result(result)
+        return {"content": [{"type": "text", "text": text}], "structuredContent": result}
+    
+    def encode_tool_result(self, result: Any, output_schema: Optional[Dict[str, Any]], max_bytes: int) -> bytes:
+        """Codifică rezultatul tools/call, scurtat până când octeții trimiși încap în max_bytes"""
+        encoded = encode_message(self.tool_result(result, output_schema))
+        if len(encoded) <= max_bytes or not isinstance(result, dict) or "error" in result:
+            return encoded
+        # Mesajul crește proporțional cu rezultatul (de două ori în modul "full"): bugetul
+        # rezultatului pornește de la acest raport și scade proporțional la fiecare depășire
+        budget = max_bytes * len(encode_message(result)) // len(encoded)
+        while True:
+            truncated = truncate_result(result, budget)
+            encoded = encode_message(self.tool_result(truncated, output_schema))
+            if len(encoded) <= max_bytes or "error" in truncated:
+                return encoded
+            budget = min(budget - 1, budget * max_bytes // len(encoded))
     
     def register_resource(self, uri: str, name: str, description: str, handler):
         """Înregistrează un resource MCP"""
@@ -48,135 +370,1747 @@ class MCPServer:
             "description": description,
             "handler": handler
         }
+        self.static_results.clear()
+    
+    def negotiate(self, requested_version: Optional[str]) -> None:
+        """Alege versiunea protocolului: cea cerută, dacă e acceptată, altfel cea mai nouă"""
+        if requested_version in SUPPORTED_PROTOCOL_VERSIONS:
+            self.protocol_version = requested_version
+        else:
+            self.protocol_version = SUPPORTED_PROTOCOL_VERSIONS[0]
+    
+    async def initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.negotiate(params.get("protocolVersion"))
+        return {
+            "protocolVersion": self.protocol_version,
+            "capabilities": {
+                "tools": {"listChanged": True},
+                "resources": {"subscribe": True, "listChanged": True}
+            },
+            "serverInfo": {
+                "name": "academiadepolitie",
+                "version": "1.0.0"
+            }
+        }
+    
+    async def list_tools(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"tools": [self.describe_tool(tool_info) for tool_info in self.tools.values()]}
+    
+    async def call_tool(self, params: Dict[str, Any], max_bytes: int = MAX_RESULT_BYTES) -> bytes:
+        tool_name = params.get("name")
+        arguments = params.get("arguments", {})
+        if tool_name not in self.tools:
+            raise Exception(f"Tool necunoscut: {tool_name}")
+        tool_info = self.tools[tool_name]
+        progress_token = (params.get("_meta") or {}).get("progressToken")
+        async def report_progress(progress: float, total: float, message: str) -> None:
+            await self.notify({
+                "jsonrpc": "2.0",
+                "method": "notifications/progress",
+                "params": {"progressToken": progress_token, "progress": progress,
+                           "total": total, "message": message}
+            })
+        reporter = report_progress if progress_token is not None and self.notify is not None else None
+        token = progress_reporter.set(reporter)
+        try:
+            result = await tool_info["handler"](**arguments)
+        finally:
+            progress_reporter.reset(token)
+        return self.encode_tool_result(result, tool_info["outputSchema"], max_bytes)
+    
+    async def list_resources(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "resources": [
+                {
+                    "uri": resource_info["uri"],
+                    "name": resource_info["name"],
+                    "description": resource_info["description"]
+                }
+                for resource_info in self.resources.values()
+            ]
+        }
+    
+    async def read_resource(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        uri = params.get("uri")
+        if uri not in self.resources:
+            raise Exception(f"Resource necunoscut: {uri}")
+        content = await self.resources[uri]["handler"]()
+        return {
+            "contents": [
+                {
+                    "uri": uri,
+                    "mimeType": "application/json",
+                    "text": content
+                }
+            ]
+        }
+    
+    def track(self, request_id: Any, task: asyncio.Task) -> None:
+        """Asociază id-ul cererii cu task-ul care o procesează"""
+        if not isinstance(request_id, (str, int)):
+            return
+        self.running[request_id] = task
+        
+        def untrack(_: asyncio.Task) -> None:
+            if self.running.get(request_id) is task:
+                del self.running[request_id]
+        task.add_done_callback(untrack)
+    
+    def cancel_request(self, params: Dict[str, Any]) -> None:
+        """Anulează cererea indicată de notifications/cancelled, inclusiv apelul HTTP în curs;
+        cererea anulată nu primește răspuns"""
+        request_id = params.get("requestId")
+        task = self.running.get(request_id) if isinstance(request_id, (str, int)) else None
+        if task is not None and not task.done():
+            task.cancel()
+    
+    async def cancel_notification(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.cancel_request(params)
+        return {}
     
     async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Procesează cereri MCP"""
         method = request.get("method")
-        params = request.get("params", {})
+        params = request.get("params") or {}
         request_id = request.get("id")
         
         try:
-            if method == "initialize":
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "protocolVersion": "2024-11-05",
-                        "capabilities": {
-                            "tools": {"listChanged": True},
-                            "resources": {"subscribe": True, "listChanged": True}
-                        },
-                        "serverInfo": {
-                            "name": "academiadepolitie",
-                            "version": "1.0.0"
-                        }
-                    }
-                }
-            
-            elif method == "tools/list":
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "tools": [
-                            {
-                                "name": tool_name,
-                                "description": tool_info["description"],
-                                "inputSchema": tool_info["inputSchema"]
-                            }
-                            for tool_name, tool_info in self.tools.items()
-                        ]
-                    }
-                }
-            
-            elif method == "tools/call":
-                tool_name = params.get("name")
-                arguments = params.get("arguments", {})
-                
-                if tool_name in self.tools:
-                    result = await self.tools[tool_name]["handler"](**arguments)
-                    return {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": json.dumps(result, indent=2, ensure_ascii=False)
-                                }
-                            ]
-                        }
-                    }
-                else:
-                    raise Exception(f"Tool necunoscut: {tool_name}")
-            
-            elif method == "resources/list":
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "resources": [
-                            {
-                                "uri": resource_info["uri"],
-                                "name": resource_info["name"],
-                                "description": resource_info["description"]
-                            }
-                            for resource_info in self.resources.values()
-                        ]
-                    }
-                }
-            
-            elif method == "resources/read":
-                uri = params.get("uri")
-                if uri in self.resources:
-                    content = await self.resources[uri]["handler"]()
-                    return {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "contents": [
-                                {
-                                    "uri": uri,
-                                    "mimeType": "application/json",
-                                    "text": content
-                                }
-                            ]
-                        }
-                    }
-                else:
-                    raise Exception(f"Resource necunoscut: {uri}")
-            
-            else:
+            handler = self.handlers.get(method)
+            if handler is None:
                 raise Exception(f"Metodă necunoscută: {method}")
-                
-        except Exception as e:
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
-                "error": {
-                    "code": -32603,
-                    "message": str(e)
-                }
+                "result": await handler(params)
             }
+        except Exception as e:
+            return internal_error(request_id, str(e))
+    
+    async def handle_message(self, request: Dict[str, Any]) -> bytes:
+        """Procesează o cerere și întoarce răspunsul serializat, gata de scris pe stdout"""
+        method = request.get("method")
+        if method == "tools/call":
+            return await self.handle_tool_call(request)
+        if method not in STATIC_METHODS:
+            return encode_message(await self.handle_request(request))
+        
+        # Răspunsurile statice se serializează o singură dată per versiune de
+        # protocol; la fiecare cerere se completează doar "id"
+        params = request.get("params") or {}
+        if method == "initialize":
+            self.negotiate(params.get("protocolVersion"))
+        key = (method, self.protocol_version)
+        result = self.static_results.get(key)
+        if result is None:
+            result = encode_message(await self.handlers[method](params))
+            self.static_results[key] = result
+        return result_prefix(request.get("id")) + result + b"}"
+    
+    async def handle_tool_call(self, request: Dict[str, Any]) -> bytes:
+        """tools/call: rezultatul se codifică o singură dată, direct în mesaj, iar
+        MAX_RESULT_BYTES se aplică octeților trimiși, inclusiv anvelopei JSON-RPC"""
+        prefix = result_prefix(request.get("id"))
+        try:
+            result = await self.call_tool(request.get("params") or {}, MAX_RESULT_BYTES - len(prefix) - 1)
+        except Exception as e:
+            return encode_message(internal_error(request.get("id"), str(e)))
+        return prefix + result + b"}"
+
+    async def handle_batch(self, requests: List[Any], slots: Optional[asyncio.Semaphore] = None) -> Optional[bytes]:
+        """Execută membrii unui batch JSON-RPC în paralel; răspunsurile formează un singur array
+
+        Cu slots, fiecare membru ocupă un loc din aceeași limită ca cererile individuale,
+        astfel că un batch mare nu ocolește MAX_CONCURRENT_REQUESTS.
+        """
+        if not requests:
+            return encode_message(invalid_request(None))
+        
+        async def handle_member(request: Any) -> Optional[bytes]:
+            if not isinstance(request, dict):
+                return encode_message(invalid_request(None))
+            try:
+                # Anularea nu ocupă un slot: altfel n-ar ajunge la cererile pe care le oprește
+                if slots is None or request.get("method") == "notifications/cancelled":
+                    response = await self.handle_message(request)
+                else:
+                    async with slots:
+                        response = await self.handle_message(request)
+            except Exception as e:
+                response = encode_message(internal_error(request.get("id"), str(e)))
+            # Notificările din batch nu primesc răspuns
+            return response if "id" in request else None
+        
+        tasks = [asyncio.ensure_future(handle_member(request)) for request in requests]
+        for request, task in zip(requests, tasks):
+            if isinstance(request, dict) and "id" in request:
+                self.track(request["id"], task)
+        # Membrii anulați (notifications/cancelled) nu primesc răspuns
+        responses = [
+            response for response in await asyncio.gather(*tasks, return_exceptions=True)
+            if isinstance(response, bytes)
+        ]
+        if not responses:
+            return None
+        return b"[" + b",".join(responses) + b"]"
+
+def invalid_request(request_id: Any) -> Dict[str, Any]:
+    """Răspunsul JSON-RPC pentru o cerere malformată"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": -32600, "message": "Invalid Request"}
+    }
+
+def internal_error(request_id: Any, message: str) -> Dict[str, Any]:
+    """Răspunsul JSON-RPC pentru o eroare apărută la procesarea cererii"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": -32603, "message": message}
+    }
+
+def result_prefix(request_id: Any) -> bytes:
+    """Începutul unui răspuns JSON-RPC reușit; urmează rezultatul deja codificat și acolada finală"""
+    return b'{"jsonrpc":"2.0","id":' + encode_message(request_id) + b',"result":'
+
+class HTTPError(Exception):
+    """Răspuns HTTP cu status de eroare (>= 400)"""
+    def __init__(self, status: int, reason: str, headers: Dict[str, str]):
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+
+class ResponseTooLarge(Exception):
+    """Corpul decodat al răspunsului depășește HTTP_MAX_BODY_BYTES"""
+    def __init__(self, limit: int):
+        super().__init__(f"Răspuns prea mare: peste {limit} octeți")
+        self.limit = limit
+
+class HTTPResponse:
+    """Răspuns HTTP complet citit de pe conexiune"""
+    def __init__(self, status: int, reason: str, headers: Dict[str, str], body: bytes, keep_alive: bool):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+        # Măsurători de transfer: octeți pe fir (comprimați) și durate
+        self.wire_bytes = len(body)
+        self.transfer_seconds = 0.0
+        self.decompress_seconds = 0.0
+
+class _ContentDecoder:
+    """Decompresie incrementală gzip / deflate, bucată cu bucată"""
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        # MAX_WBITS | 32 detectează automat antetul gzip sau zlib
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        self._first = True
+
+    def decompress(self, chunk: bytes) -> bytes:
+        try:
+            data = self._decompressor.decompress(chunk)
+        except zlib.error:
+            if not (self._first and self.encoding == "deflate"):
+                raise
+            # Unele servere trimit deflate "brut", fără antet zlib
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self._decompressor.decompress(chunk)
+        self._first = False
+        return data
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+class TransferStats:
+    """Octeți pe fir vs. decodați și timpul estimat economisit prin compresie"""
+    def __init__(self):
+        self.responses = 0
+        self.compressed_responses = 0
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.decompress_seconds = 0.0
+        self.estimated_seconds_saved = 0.0
+        self.last: Dict[str, Any] = {}
+
+    def record(self, response: HTTPResponse) -> None:
+        saved_bytes = len(response.body) - response.wire_bytes
+        # Timpul economisit = octeții economisiți la debitul observat, minus costul decompresiei
+        seconds_saved = 0.0
+        network_seconds = response.transfer_seconds - response.decompress_seconds
+        if saved_bytes > 0 and network_seconds > 0:
+            throughput = response.wire_bytes / network_seconds
+            seconds_saved = saved_bytes / throughput - response.decompress_seconds
+        
+        self.responses += 1
+        self.wire_bytes += response.wire_bytes
+        self.body_bytes += len(response.body)
+        self.decompress_seconds += response.decompress_seconds
+        self.estimated_seconds_saved += seconds_saved
+        if response.headers.get("content-encoding"):
+            self.compressed_responses += 1
+        self.last = {
+            "content_encoding": response.headers.get("content-encoding", "identity"),
+            "wire_bytes": response.wire_bytes,
+            "body_bytes": len(response.body),
+            "bytes_saved": saved_bytes,
+            "transfer_ms": round(response.transfer_seconds * 1000, 2),
+            "decompress_ms": round(response.decompress_seconds * 1000, 2),
+            "estimated_ms_saved": round(seconds_saved * 1000, 2)
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "responses": self.responses,
+            "compressed_responses": self.compressed_responses,
+            "wire_bytes": self.wire_bytes,
+            "body_bytes": self.body_bytes,
+            "bytes_saved": self.body_bytes - self.wire_bytes,
+            "decompress_ms": round(self.decompress_seconds * 1000, 2),
+            "estimated_ms_saved": round(self.estimated_seconds_saved * 1000, 2),
+            "last": self.last
+        }
+
+transfer_stats = TransferStats()
+
+class _Connection:
+    """Conexiune TCP/TLS reutilizabilă din pool"""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.idle_since = time.monotonic()
+
+    def is_usable(self, keepalive_expiry: float) -> bool:
+        if self.reader.at_eof() or self.writer.is_closing():
+            return False
+        return time.monotonic() - self.idle_since < keepalive_expiry
+
+    def close(self) -> None:
+        self.writer.close()
+
+class AsyncHTTPClient:
+    """Client HTTP/1.1 asyncio cu conexiuni keep-alive, doar librării standard"""
+
+    def __init__(self, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY, timeout: float = HTTP_TIMEOUT,
+                 max_body_bytes: int = HTTP_MAX_BODY_BYTES):
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle: Dict[Tuple[str, int, bool], List[_Connection]] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    async def request(self, method: str, url: str, headers: Dict[str, str]) -> HTTPResponse:
+        """Trimite o cerere și urmează redirect-urile (ca urllib)"""
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            response = await self._request_once(method, url, headers)
+            location = response.headers.get("location")
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                return response
+            url = urllib.parse.urljoin(url, location)
+        raise HTTPError(response.status, "Prea multe redirect-uri", response.headers)
+
+    async def _request_once(self, method: str, url: str, headers: Dict[str, str]) -> HTTPResponse:
+        parts = urllib.parse.urlsplit(url)
+        use_ssl = parts.scheme == "https"
+        host = parts.hostname or ""
+        port = parts.port or (443 if use_ssl else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        
+        host_header = host if parts.port is None else f"{host}:{port}"
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}", "Connection: keep-alive",
+                 "Accept-Encoding: gzip, deflate"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        raw_request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        
+        key = (host, port, use_ssl)
+        async with self._slots:
+            # O conexiune keep-alive poate fi închisă de server între cereri;
+            # în acest caz cererea (idempotentă) se repetă pe o conexiune nouă
+            while True:
+                conn, reused = await self._acquire(key)
+                try:
+                    response = await asyncio.wait_for(
+                        self._exchange(conn, raw_request, method), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn.close()
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                
+                if response.keep_alive:
+                    conn.idle_since = time.monotonic()
+                    self._idle.setdefault(key, []).append(conn)
+                else:
+                    conn.close()
+                return response
+
+    async def _acquire(self, key: Tuple[str, int, bool]) -> Tuple[_Connection, bool]:
+        idle = self._idle.get(key, [])
+        while idle:
+            conn = idle.pop()
+            if conn.is_usable(self.keepalive_expiry):
+                return conn, True
+            conn.close()
+        
+        host, port, use_ssl = key
+        ssl_context = None
+        if use_ssl:
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context), self.timeout
+        )
+        return _Connection(reader, writer), False
+
+    async def _exchange(self, conn: _Connection, raw_request: bytes, method: str) -> HTTPResponse:
+        conn.writer.write(raw_request)
+        await conn.writer.drain()
+        reader = conn.reader
+        
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Conexiunea a fost închisă de server")
+        version, _, rest = status_line.decode("latin-1").strip().partition(" ")
+        status_text, _, reason = rest.partition(" ")
+        status = int(status_text)
+        
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if "chunked" not in headers.get("transfer-encoding", "").lower() and "content-length" not in headers:
+            keep_alive = False
+        
+        # Corpul se decomprimă pe măsură ce sosește, direct într-un singur buffer:
+        # fără copie comprimată completă și fără lista de bucăți de concatenat
+        encoding = headers.get("content-encoding", "").lower()
+        decoder = _ContentDecoder(encoding) if encoding in ("gzip", "x-gzip", "deflate") else None
+        body = bytearray()
+        wire_bytes = 0
+        decompress_seconds = 0.0
+        started = time.perf_counter()
+        if not (method == "HEAD" or status in (204, 304) or 100 <= status < 200):
+            if int(headers.get("content-length", 0) or 0) > self.max_body_bytes:
+                raise ResponseTooLarge(self.max_body_bytes)
+            async for chunk in self._read_body(reader, headers):
+                wire_bytes += len(chunk)
+                if decoder is None:
+                    body += chunk
+                else:
+                    decompress_started = time.perf_counter()
+                    body += decoder.decompress(chunk)
+                    decompress_seconds += time.perf_counter() - decompress_started
+                if len(body) > self.max_body_bytes:
+                    raise ResponseTooLarge(self.max_body_bytes)
+            if decoder is not None:
+                body += decoder.flush()
+        
+        response = HTTPResponse(status, reason, headers, body, keep_alive)
+        response.wire_bytes = wire_bytes
+        response.transfer_seconds = time.perf_counter() - started
+        response.decompress_seconds = decompress_seconds
+        transfer_stats.record(response)
+        return response
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]):
+        """Generează corpul răspunsului, așa cum vine pe fir, în bucăți"""
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Ignoră trailer-ele până la linia goală
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                while size > 0:
+                    chunk = await reader.readexactly(min(size, HTTP_READ_CHUNK))
+                    size -= len(chunk)
+                    yield chunk
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                chunk = await reader.readexactly(min(remaining, HTTP_READ_CHUNK))
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await reader.read(HTTP_READ_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def aclose(self) -> None:
+        """Închide toate conexiunile din pool"""
+        for connections in self._idle.values():
+            for conn in connections:
+                conn.close()
+        self._idle.clear()
+
+_http_client: Optional[AsyncHTTPClient] = None
+
+def get_http_client() -> AsyncHTTPClient:
+    """Returnează clientul HTTP partajat pentru event loop-ul curent"""
+    global _http_client
+    if _http_client is None or _http_client.loop is not asyncio.get_running_loop():
+        _http_client = AsyncHTTPClient()
+    return _http_client
+
+async def close_http_client() -> None:
+    """Închide clientul HTTP partajat"""
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+# Modulele care primesc un număr de elemente în loc de un flag
+COUNT_MODULES = ("activitati_recente", "utilizatori_compatibili")
+
+def requested_modules(params: Dict[str, Any]) -> List[str]:
+    """Modulele incluse într-o cerere (toate pentru all=1)"""
+    if params.get("all"):
+        return list(MODULE_TTL)
+    return [name for name in MODULE_TTL if name in params]
+
+class CacheEntry:
+    """Intrare din cache cu momentul salvării, al expirării și limita de învechire"""
+    __slots__ = ("value", "stored_at", "expires_at", "stale_until", "validators")
+
+    def __init__(self, value: Dict[str, Any], ttl: float, max_stale: float, stored_at: Optional[float] = None,
+                 validators: Optional[Dict[str, str]] = None):
+        self.value = value
+        self.stored_at = time.monotonic() if stored_at is None else stored_at
+        self.expires_at = self.stored_at + ttl
+        self.stale_until = self.expires_at + max_stale
+        # ETag / Last-Modified pentru revalidare condiționată
+        self.validators = validators
+
+class CacheHit:
+    """Răspuns găsit în cache (exact sau construit din module)"""
+    __slots__ = ("value", "stored_at", "stale")
+
+    def __init__(self, value: Dict[str, Any], stored_at: float, stale: bool):
+        self.value = value
+        self.stored_at = stored_at
+        self.stale = stale
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+class DiskCache:
+    """Cache persistent în SQLite, partajat între procesele serverului.
+
+    Toate operațiile rulează pe un singur thread dedicat, deci event loop-ul
+    nu așteaptă după disc, iar baza se deschide abia la prima folosire.
+    Modul WAL și busy_timeout permit accesul simultan din mai multe procese.
+    La orice eroare SQLite cache-ul persistent se dezactivează, fără a
+    afecta cererile.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DISK_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+
+    @staticmethod
+    def _encode_key(key: Tuple[Tuple[str, Any], ...]) -> str:
+        return json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Cache-ul conține date ale studenților: directorul nou și fișierul bazei
+            # sunt accesibile doar proprietarului (SQLite preia permisiunile fișierului
+            # pentru -wal / -shm); fișierele create de versiuni mai vechi se restrâng
+            os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            for path in (self.path, self.path + "-wal", self.path + "-shm"):
+                if os.path.exists(path) and os.stat(path).st_mode & 0o077:
+                    os.chmod(path, 0o600)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, user_id INTEGER, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL NOT NULL, stale_until REAL NOT NULL, "
+                "last_access REAL NOT NULL, validators TEXT)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if "validators" not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN validators TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_user_id ON entries (user_id)")
+            self._conn = conn
+        return self._conn
+
+    def _guarded(self, operation, *args):
+        if not self.enabled:
+            return None
+        try:
+            return operation(self._connect(), *args)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self.enabled = False
+            print(f"⚠️  Cache-ul persistent a fost dezactivat: {e}", file=sys.stderr)
+            return None
+
+    async def load(self, keys: List[Tuple[Tuple[str, Any], ...]]) -> List[Tuple[Tuple[Tuple[str, Any], ...], Dict[str, Any], float, float, float, Optional[Dict[str, str]]]]:
+        """Încarcă intrările utilizabile: (cheie, valoare, vârstă, TTL rămas, învechire rămasă, validatori).
+
+        Intrările cu ETag / Last-Modified se încarcă și după limita de
+        învechire, ca să poată fi revalidate printr-o cerere condiționată.
+        """
+        if not self.enabled or not keys:
+            return []
+        loop = asyncio.get_running_loop()
+        encoded = {self._encode_key(key): key for key in keys}
+        rows = await loop.run_in_executor(self._executor, self._guarded, self._load, list(encoded))
+        now = time.time()
+        return [
+            (encoded[key], value, now - stored_at, expires_at - now, stale_until - now, validators)
+            for key, value, stored_at, expires_at, stale_until, validators in rows or []
+        ]
+
+    def _load(self, conn: sqlite3.Connection, keys: List[str]) -> List[Tuple[str, Dict[str, Any], float, float, float, Optional[Dict[str, str]]]]:
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(
+            f"SELECT key, value, stored_at, expires_at, stale_until, validators FROM entries "
+            f"WHERE key IN ({placeholders}) AND (stale_until > ? OR validators IS NOT NULL)",
+            (*keys, now)
+        ).fetchall()
+        if rows:
+            conn.execute(
+                f"UPDATE entries SET last_access = ? WHERE key IN ({placeholders})",
+                (now, *keys)
+            )
+        return [(key, json.loads(value), stored_at, expires_at, stale_until,
+                 json.loads(validators) if validators else None)
+                for key, value, stored_at, expires_at, stale_until, validators in rows]
+
+    def store(self, key: Tuple[Tuple[str, Any], ...], value: Dict[str, Any], ttl: float, max_stale: float,
+              validators: Optional[Dict[str, str]] = None) -> None:
+        """Salvează o intrare în fundal (serializarea se face pe thread-ul cache-ului)"""
+        if self.enabled:
+            self._executor.submit(self._guarded, self._store, key, value, ttl, max_stale, validators)
+
+    def _store(self, conn: sqlite3.Connection, key: Tuple[Tuple[str, Any], ...], value: Dict[str, Any],
+               ttl: float, max_stale: float, validators: Optional[Dict[str, str]]) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._encode_key(key), dict(key).get("user_id"), payload, size,
+             now, now + ttl, now + ttl + max_stale, now, json.dumps(validators) if validators else None)
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Șterge intrările expirate (fără validatori), apoi cele mai vechi până sub limita de mărime"""
+        conn.execute("DELETE FROM entries WHERE stale_until <= ? AND validators IS NULL", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Șterge în fundal intrările unui utilizator (sau toate)"""
+        if self.enabled:
+            self._executor.submit(self._guarded, self._invalidate, user_id)
+
+    def _invalidate(self, conn: sqlite3.Connection, user_id: Optional[int]) -> None:
+        if user_id is None:
+            conn.execute("DELETE FROM entries")
+        else:
+            conn.execute("DELETE FROM entries WHERE user_id = ?", (user_id,))
+
+    def close(self) -> None:
+        """Așteaptă scrierile în curs și închide baza de date"""
+        def _close() -> None:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(_close)
+        self._executor.shutdown(wait=True)
+
+class ResponseCache:
+    """Cache în memorie pentru răspunsurile API, cu TTL și evacuare LRU.
+
+    Pe lângă răspunsul exact, fiecare modul din răspuns (inclusiv dintr-un
+    răspuns all=1) este păstrat separat, astfel încât o cerere ulterioară
+    pentru un subset de module poate fi construită local.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, disk: Optional[DiskCache] = None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self._entries: "OrderedDict[Tuple[Tuple[str, Any], ...], CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.assembled = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.widening_supported = True
+
+    @staticmethod
+    def key_for(params: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+        """Cheie canonică: parametrii deja validați, în ordine fixă"""
+        return tuple(sorted(params.items()))
+
+    @staticmethod
+    def ttl_for(params: Dict[str, Any]) -> float:
+        """TTL-ul unui răspuns = cel mai mic TTL al modulelor cerute"""
+        if "module" in params:
+            return MODULE_TTL[params["module"]]
+        ttls = [ttl for name, ttl in MODULE_TTL.items() if name in requested_modules(params)]
+        return min(ttls) if ttls else min(MODULE_TTL.values())
+
+    @staticmethod
+    def max_stale_for(params: Dict[str, Any]) -> float:
+        """Învechirea permisă = cea mai mică dintre ale modulelor cerute"""
+        if "module" in params:
+            return MODULE_MAX_STALE[params["module"]]
+        stale = [limit for name, limit in MODULE_MAX_STALE.items() if name in requested_modules(params)]
+        return min(stale) if stale else 0.0
+
+    @staticmethod
+    def module_params(module: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Parametrii care determină conținutul unui singur modul"""
+        module_params = {"user_id": params["user_id"], "module": module}
+        for name in ("materie", "instructiuni_llm"):
+            if name in params:
+                module_params[name] = params[name]
+        if module == "activitati_recente" and "only" in params:
+            module_params["only"] = params["only"]
+        if module == "utilizatori_compatibili" and "focus" in params:
+            module_params["focus"] = params["focus"]
+        return module_params
+
+    def get(self, params: Dict[str, Any]) -> Optional[CacheHit]:
+        """Caută răspunsul; poate returna o intrare expirată, dar încă în limita de învechire"""
+        hit = self._find(params)
+        if hit is None:
+            self.misses += 1
+        return hit
+
+    async def aget(self, params: Dict[str, Any]) -> Optional[CacheHit]:
+        """Ca get(), dar la ratare încarcă din cache-ul persistent intrările relevante"""
+        hit = self._find(params)
+        if hit is None and self.disk is not None:
+            rows = await self.disk.load(self._candidate_keys(params))
+            now = time.monotonic()
+            for key, value, age, ttl_left, stale_left, validators in rows:
+                if key not in self._entries:
+                    self._store(key, value, age + ttl_left, stale_left - ttl_left, now - age,
+                                validators=validators, persist=False)
+            hit = self._find(params)
+            if hit is not None:
+                self.disk_hits += 1
+        if hit is None:
+            self.misses += 1
+        return hit
+
+    def set(self, params: Dict[str, Any], value: Dict[str, Any], validators: Optional[Dict[str, str]] = None) -> None:
+        self._store(self.key_for(params), value, self.ttl_for(params), self.max_stale_for(params),
+                    validators=validators)
+        
+        # Modulele se salvează separat, împreună cu restul răspunsului (metadata etc.)
+        envelope = {name: data for name, data in value.items() if name not in MODULE_TTL}
+        for module in requested_modules(params):
+            if module in value:
+                module_params = self.module_params(module, params)
+                self._store(self.key_for(module_params), {
+                    "data": value[module],
+                    "count": params.get(module) if module in COUNT_MODULES else None,
+                    "envelope": envelope
+                }, self.ttl_for(module_params), self.max_stale_for(module_params))
+
+    def revalidation_entry(self, params: Dict[str, Any]) -> Optional[CacheEntry]:
+        """Intrarea exactă cu ETag / Last-Modified, chiar expirată, pentru o cerere condiționată"""
+        entry = self._entries.get(self.key_for(params))
+        return entry if entry is not None and entry.validators else None
+
+    def widen(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Parametrii de cerut efectiv la API: fereastra maximă de activități"""
+        wanted = params.get("activitati_recente")
+        if not self.widening_supported or wanted is None or wanted >= ACTIVITIES_PREFETCH_WINDOW:
+            return params
+        return {**params, "activitati_recente": ACTIVITIES_PREFETCH_WINDOW}
+
+    def narrow(self, params: Dict[str, Any], widened: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Răspunsul pentru cererea originală, după o cerere lărgită"""
+        hit = self._assemble(params)
+        if hit is None:
+            # Lărgirea se oprește doar dacă formatul activităților nu permite tăierea
+            # locală; altfel (de ex. un alt modul lipsă din răspuns) doar acest apel
+            # revine la cererea originală
+            activities = widened.get("activitati_recente")
+            if activities is not None and not isinstance(activities, list):
+                self.widening_supported = False
+            return None
+        return hit.value
+
+    def invalidate(self, user_id: Optional[int] = None) -> int:
+        """Șterge intrările unui utilizator (sau tot cache-ul); returnează câte au fost șterse"""
+        if self.disk is not None:
+            self.disk.invalidate(user_id)
+        if user_id is None:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+        keys = [key for key in self._entries if dict(key).get("user_id") == user_id]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def _find(self, params: Dict[str, Any]) -> Optional[CacheHit]:
+        entry = self._lookup(self.key_for(params))
+        if entry is not None:
+            self.hits += 1
+            return CacheHit(entry.value, entry.stored_at, entry.expires_at <= time.monotonic())
+        hit = self._assemble(params)
+        if hit is not None:
+            self.assembled += 1
+        return hit
+
+    def _candidate_keys(self, params: Dict[str, Any]) -> List[Tuple[Tuple[str, Any], ...]]:
+        """Toate cheile pe care get() le poate consulta pentru acești parametri"""
+        keys = [self.key_for(params)]
+        widened = self.widen(params)
+        if widened is not params:
+            keys.append(self.key_for(widened))
+        if not params.get("all"):
+            for module in requested_modules(params):
+                keys.extend(self.key_for(probe) for probe in self._module_probes(module, params))
+        return keys
+
+    def _lookup(self, key: Tuple[Tuple[str, Any], ...]) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until <= time.monotonic():
+            # Corpul cu validatori rămâne (până la evacuarea LRU) pentru revalidare
+            if not entry.validators:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Tuple[Tuple[str, Any], ...], value: Dict[str, Any], ttl: float, max_stale: float,
+               stored_at: Optional[float] = None, validators: Optional[Dict[str, str]] = None,
+               persist: bool = True) -> None:
+        self._entries[key] = CacheEntry(value, ttl, max_stale, stored_at, validators)
+        if persist and self.disk is not None:
+            self.disk.store(key, value, ttl, max_stale, validators)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _assemble(self, params: Dict[str, Any]) -> Optional[CacheHit]:
+        """Construiește răspunsul din module salvate anterior, fără apel la API"""
+        modules = requested_modules(params)
+        if params.get("all") or not modules:
+            return None
+        
+        result: Optional[Dict[str, Any]] = None
+        oldest = now = time.monotonic()
+        stale = False
+        for module in modules:
+            if module in COUNT_MODULES:
+                found = self._subsume(module, params)
+            else:
+                entry = self._lookup(self.key_for(self.module_params(module, params)))
+                found = (entry, entry.value["data"]) if entry is not None else None
+            if found is None:
+                return None
+            entry, data = found
+            if result is None:
+                result = dict(entry.value["envelope"])
+            result[module] = data
+            oldest = min(oldest, entry.stored_at)
+            stale = stale or entry.expires_at <= now
+        return CacheHit(result, oldest, stale)
+
+    def _module_probes(self, module: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cheia exactă a modulului, urmată de variantele fără filtrele 'only' / 'materie'"""
+        exact = self.module_params(module, params)
+        probes = [exact]
+        if module == "activitati_recente":
+            dropped = [name for name in ACTIVITY_FILTER_FIELDS if name in exact]
+            for name in dropped:
+                probes.append({key: value for key, value in exact.items() if key != name})
+            if len(dropped) == 2:
+                probes.append({key: value for key, value in exact.items() if key not in dropped})
+        return probes
+
+    def _subsume(self, module: str, params: Dict[str, Any]) -> Optional[Tuple[CacheEntry, Any]]:
+        """Servește un modul cu număr de elemente dintr-o listă salvată mai largă.
+
+        O listă salvată pentru N elemente (cu aceleași filtre sau fără
+        'only' / 'materie') conține cele mai recente N activități; după
+        filtrare locală, primele K sunt exact cele K cerute dacă există
+        cel puțin K, iar dacă lista are sub N elemente istoricul e complet.
+        """
+        wanted = params[module]
+        probes = self._module_probes(module, params)
+        exact = probes[0]
+        for probe in probes:
+            entry = self._lookup(self.key_for(probe))
+            if entry is None:
+                continue
+            saved = entry.value
+            items = saved["data"]
+            if not isinstance(items, list):
+                # Format necunoscut: doar potrivire exactă
+                if probe is exact and saved["count"] == wanted:
+                    return entry, items
+                continue
+            
+            for name, field in ACTIVITY_FILTER_FIELDS.items():
+                if name in exact and name not in probe:
+                    if not all(isinstance(item, dict) and field in item for item in items):
+                        items = None
+                        break
+                    items = [item for item in items if str(item[field]) == str(exact[name])]
+            if items is None:
+                continue
+            
+            complete = saved["count"] is not None and len(saved["data"]) < saved["count"]
+            if len(items) >= wanted:
+                return entry, items[:wanted]
+            if complete:
+                return entry, items
+        return None
+
+response_cache = ResponseCache(disk=DiskCache(DISK_CACHE_PATH) if DISK_CACHE_PATH else None)
+
+def invalidate_cache(user_id: Optional[int] = None) -> int:
+    """Invalidează explicit cache-ul pentru un utilizator sau complet"""
+    return response_cache.invalidate(user_id)
+
+async def invalidate_cache_tool(user_id: Optional[int] = None) -> Dict[str, Any]:
+    """Golește cache-ul de răspunsuri (memorie și disc) pentru un utilizator sau complet
+
+    Args:
+        user_id: ID-ul utilizatorului; fără el se golește tot cache-ul
+
+    Returns:
+        Numărul de intrări din memorie șterse
+    """
+    return {"tool": "invalidate_cache", "user_id": user_id, "invalidated": invalidate_cache(user_id)}
+
+class ApiResponse:
+    """Răspuns API decodat, cu validatorii HTTP pentru cereri condiționate"""
+    __slots__ = ("data", "validators", "not_modified")
+
+    def __init__(self, data: Optional[Dict[str, Any]], validators: Dict[str, str], not_modified: bool = False):
+        self.data = data
+        self.validators = validators
+        self.not_modified = not_modified
+
+# Header-ele validatorilor primiți și header-ul condiționat corespunzător
+VALIDATOR_HEADERS = (("etag", "If-None-Match"), ("last-modified", "If-Modified-Since"))
+
+async def request_internal_api_once(params: Dict[str, Any], validators: Optional[Dict[str, str]] = None) -> ApiResponse:
+    """O singură cerere HTTP către API-ul intern; condiționată dacă primește validatori"""
+    # Adaugă tokenul JWT dacă există
+    headers = DEFAULT_HEADERS.copy()
+    if JWT_TOKEN:
+        headers["Authorization"] = f"Bearer {JWT_TOKEN}"
+    for name, conditional in VALIDATOR_HEADERS:
+        if validators and name in validators:
+            headers[conditional] = validators[name]
+    
+    url = f"{INTERNAL_API_BASE}/profile_for_conversation.php"
+    query_string = urllib.parse.urlencode(params)
+    full_url = f"{url}?{query_string}"
+    
+    response = await get_http_client().request("GET", full_url, headers)
+    received = {name: response.headers[name] for name, _ in VALIDATOR_HEADERS if name in response.headers}
+    if response.status == 304 and validators:
+        return ApiResponse(None, {**validators, **received}, not_modified=True)
+    if response.status >= 400:
+        raise HTTPError(response.status, response.reason, response.headers)
+    # json.loads primește direct buffer-ul de octeți, eliberat imediat după parsare,
+    # înainte ca rezultatul să fie împachetat și serializat
+    data = json.loads(response.body)
+    response.body = b""
+    return ApiResponse(data, received)
+
+# Transportul cererilor către API: implicit clientul stdlib de mai sus; server.py
+# (FastMCP) îl înlocuiește cu httpx, restul logicii (cache, reîncercări, limitare)
+# rămânând comună celor două servere
+ApiTransport = Callable[[Dict[str, Any], Optional[Dict[str, str]]], Awaitable[ApiResponse]]
+_api_transport: ApiTransport = request_internal_api_once
+
+def set_api_transport(transport: ApiTransport) -> None:
+    """Înlocuiește transportul HTTP; erorile lui trebuie să fie HTTPError, ConnectionError
+    sau asyncio.TimeoutError, pentru ca reîncercările și circuit breaker-ul să le clasifice"""
+    global _api_transport
+    _api_transport = transport
 
-async def call_internal_api(params: Dict[str, Any]) -> Dict[str, Any]:
-    """Cheamă API-ul intern cu parametrii specificați"""
+class CircuitOpenError(Exception):
+    """API-ul este considerat indisponibil; cererea eșuează fără a fi trimisă"""
+    def __init__(self, retry_in: float):
+        super().__init__(f"API indisponibil temporar (circuit breaker deschis); reîncercare în {max(retry_in, 0):.1f}s")
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Închis -> deschis după eșecuri consecutive -> semi-deschis (o singură cerere de probă) -> închis"""
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Ridică CircuitOpenError dacă cererea nu are voie să plece acum"""
+        if self.state == "closed":
+            return
+        if self.state == "open":
+            retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+            if retry_in > 0:
+                self.rejected += 1
+                raise CircuitOpenError(retry_in)
+            self.state = "half_open"
+        if self.probe_in_flight:
+            self.rejected += 1
+            raise CircuitOpenError(0)
+        self.probe_in_flight = True
+
+    def record_success(self) -> None:
+        """API-ul a răspuns (inclusiv cu o eroare a cererii, ex. 404)"""
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """API-ul nu a răspuns sau a răspuns cu o eroare de server"""
+        self.probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Cererea a fost anulată: nici succes, nici eșec"""
+        self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = self.opened_at + self.reset_timeout - time.monotonic() if self.state == "open" else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_in_s": round(max(retry_in, 0.0), 1)
+        }
+
+api_breaker = CircuitBreaker()
+
+class ApiLimiter:
+    """Token bucket + limită de concurență adaptivă (AIMD) pentru cererile către API.
+
+    Cererile care nu pot pleca imediat așteaptă la coadă, în ordinea sosirii,
+    în loc să eșueze. Limita de concurență crește cu 1 după fiecare fereastră
+    de răspunsuri normale și se înjumătățește la semne de suprasolicitare:
+    429/503/504, timeout sau latență recentă mult peste media pe termen lung.
+    """
+    def __init__(self, rate: float = API_RATE_LIMIT, burst: int = API_RATE_BURST,
+                 min_limit: int = API_CONCURRENCY_MIN, max_limit: int = API_CONCURRENCY_MAX,
+                 tolerance: float = API_LATENCY_TOLERANCE):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, max_limit // 2))
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self._waiters: "Deque[asyncio.Future[None]]" = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Latența medie pe termen scurt și lung (EWMA), în secunde
+        self.latency_short: Optional[float] = None
+        self.latency_long: Optional[float] = None
+        self.decreased_at = 0.0
+        self.acquired = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    async def acquire(self) -> None:
+        """Așteaptă, la rând, un loc de concurență și un token"""
+        if not self._waiters and self._try_take():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        started = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Locul fusese deja acordat: trece la următorul din coadă
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._dispatch()
+            raise
+        finally:
+            self.wait_seconds += time.monotonic() - started
+
+    def try_acquire(self) -> bool:
+        """Ia un loc și un token doar dacă sunt disponibile acum, fără a intra în coadă"""
+        return not self._waiters and self._try_take()
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """Eliberează locul; latența sau suprasolicitarea observată ajustează limita"""
+        busy = bool(self._waiters) or self.in_flight * 2 >= self.limit
+        self.in_flight -= 1
+        if overloaded:
+            self._decrease()
+        elif latency is not None:
+            self._observe(latency, busy)
+        self._dispatch()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(float(self.burst), self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def _try_take(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        if self.rate > 0:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+        self.in_flight += 1
+        self.acquired += 1
+        return True
+
+    def _dispatch(self) -> None:
+        """Pornește cererile din capul cozii cât timp există loc și tokenuri"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if not self._try_take():
+                break
+            self._waiters.popleft()
+            waiter.set_result(None)
+        if not self._waiters and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        elif self._waiters and self.in_flight < int(self.limit) and self._timer is None:
+            # Lipsește doar tokenul: reîncercăm când se reface unul
+            self._timer = asyncio.get_running_loop().call_later((1 - self.tokens) / self.rate, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _observe(self, latency: float, busy: bool) -> None:
+        if self.latency_short is None or self.latency_long is None:
+            self.latency_short = self.latency_long = latency
+            return
+        self.latency_short += 0.3 * (latency - self.latency_short)
+        self.latency_long += 0.05 * (latency - self.latency_long)
+        if self.latency_short > self.latency_long * self.tolerance:
+            self._decrease()
+        elif busy and self.limit < self.max_limit:
+            # Creștere aditivă: +1 după `limit` răspunsuri normale
+            increased = min(float(self.max_limit), self.limit + 1 / self.limit)
+            if int(increased) > int(self.limit):
+                self.increases += 1
+            self.limit = increased
+
+    def _decrease(self) -> None:
+        # Cel mult o reducere per interval de latență: răspunsurile lente ale aceleiași rafale nu se cumulează
+        now = time.monotonic()
+        if now - self.decreased_at < (self.latency_short or 0.0):
+            return
+        self.decreased_at = now
+        decreased = max(float(self.min_limit), self.limit / 2)
+        if int(decreased) < int(self.limit):
+            self.decreases += 1
+        self.limit = decreased
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.rate > 0:
+            self._refill()
+        return {
+            "rate_limit_per_s": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 1),
+            "concurrency_limit": int(self.limit),
+            "concurrency_range": [self.min_limit, self.max_limit],
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_queued": self.max_queued,
+            "waited": self.queued,
+            "avg_wait_ms": round(self.wait_seconds / self.queued * 1000, 1) if self.queued else 0.0,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "latency_ms": {
+                "recent": round(self.latency_short * 1000, 1) if self.latency_short is not None else None,
+                "long_term": round(self.latency_long * 1000, 1) if self.latency_long is not None else None
+            }
+        }
+
+api_limiter = ApiLimiter()
+
+class RetryStats:
+    """Reîncercările făcute către API"""
+    def __init__(self):
+        self.retries = 0
+        self.retry_after_waits = 0
+        self.gave_up = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "retry_after_waits": self.retry_after_waits,
+            "gave_up": self.gave_up
+        }
+
+retry_stats = RetryStats()
+
+class HedgeStats:
+    """Latența recentă a API-ului și cererile hedged trimise"""
+    def __init__(self, percentile: float = HEDGE_PERCENTILE):
+        self.percentile = percentile
+        self.latencies: "Deque[float]" = deque(maxlen=HEDGE_WINDOW)
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self.skipped = 0
+
+    def observe(self, latency: float) -> None:
+        self.latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """După cât timp pleacă cererea suplimentară; None dacă hedging-ul e oprit sau lipsesc date"""
+        if self.percentile <= 0 or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        delay = self.delay()
+        return {
+            "percentile": self.percentile,
+            "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 3) if self.requests else 0.0,
+            "wins": self.wins,
+            "win_rate": round(self.wins / self.hedged, 3) if self.hedged else 0.0,
+            "skipped_no_budget": self.skipped
+        }
+
+hedge_stats = HedgeStats()
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Header-ul Retry-After: secunde sau o dată HTTP"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
     try:
-        # Adaugă tokenul JWT dacă există
-        headers = DEFAULT_HEADERS.copy()
-        if JWT_TOKEN:
-            headers["Authorization"] = f"Bearer {JWT_TOKEN}"
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0.0)
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponențial cu jitter complet"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+async def request_internal_api(params: Dict[str, Any], validators: Optional[Dict[str, str]] = None) -> ApiResponse:
+    """Cererea către API-ul intern, cu reîncercări pentru erorile tranzitorii și circuit breaker
+
+    Se reîncearcă doar erorile de conexiune și statusurile RETRY_STATUSES (GET este idempotent);
+    timeout-urile nu se repetă, dar contează ca eșec pentru circuit breaker.
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        # Pauzele dintre reîncercări nu ocupă un loc în limitator
+        await api_limiter.acquire()
+        try:
+            api_breaker.before_call()
+        except CircuitOpenError:
+            api_limiter.release()
+            raise
+        started = time.monotonic()
+        try:
+            response = await request_hedged(params, validators)
+        except asyncio.CancelledError:
+            api_breaker.release()
+            api_limiter.release()
+            raise
+        except Exception as e:
+            api_limiter.release(time.monotonic() - started, overloaded=is_overload(e))
+            if is_backend_failure(e):
+                api_breaker.record_failure()
+            else:
+                api_breaker.record_success()
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+            if attempt == RETRY_ATTEMPTS - 1:
+                retry_stats.gave_up += 1
+                raise
+            retry_stats.retries += 1
+            await asyncio.sleep(delay)
+        else:
+            latency = time.monotonic() - started
+            api_limiter.release(latency)
+            hedge_stats.observe(latency)
+            api_breaker.record_success()
+            return response
+
+async def request_hedged(params: Dict[str, Any], validators: Optional[Dict[str, str]] = None) -> ApiResponse:
+    """O încercare către API; dacă întârzie peste pragul de hedging, pleacă o a doua cerere identică
+
+    Câștigă primul răspuns reușit, iar cererea rămasă se anulează. Cererea
+    suplimentară pleacă doar dacă limitatorul are loc și token disponibile imediat.
+    """
+    delay = hedge_stats.delay()
+    if delay is None:
+        return await _api_transport(params, validators)
+    
+    hedge_stats.requests += 1
+    primary = asyncio.ensure_future(_api_transport(params, validators))
+    hedge: "Optional[asyncio.Future[ApiResponse]]" = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if not api_limiter.try_acquire():
+            hedge_stats.skipped += 1
+            return await primary
         
-        url = f"{INTERNAL_API_BASE}/profile_for_conversation.php"
-        query_string = urllib.parse.urlencode(params)
-        full_url = f"{url}?{query_string}"
+        hedge_stats.hedged += 1
+        hedge = asyncio.ensure_future(_api_transport(params, validators))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in (primary, hedge):
+                if task in done and task.exception() is None:
+                    if task is hedge:
+                        hedge_stats.wins += 1
+                    return task.result()
+        # Ambele au eșuat: se raportează eroarea cererii inițiale
+        return primary.result()
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+        if hedge is not None:
+            api_limiter.release()
+
+def is_overload(error: Exception) -> bool:
+    """Eroarea arată că API-ul este suprasolicitat: limitatorul reduce concurența"""
+    if isinstance(error, HTTPError):
+        return error.status in (429, 503, 504)
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError))
+
+def is_backend_failure(error: Exception) -> bool:
+    """Eroarea arată că API-ul nu funcționează, nu doar că a respins cererea"""
+    if isinstance(error, HTTPError):
+        return error.status >= 500
+    return isinstance(error, (OSError, EOFError, asyncio.TimeoutError))
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Cât se așteaptă înainte de următoarea încercare; None dacă eroarea nu se reîncearcă"""
+    if isinstance(error, HTTPError):
+        if error.status not in RETRY_STATUSES:
+            return None
+        retry_after = parse_retry_after(error.headers.get("retry-after"))
+        if retry_after is None:
+            return backoff_delay(attempt)
+        if retry_after > RETRY_AFTER_MAX:
+            return None
+        retry_stats.retry_after_waits += 1
+        return retry_after
+    # Un timeout repetat ar dubla așteptarea; erorile TLS nu sunt tranzitorii
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ssl.SSLError)):
+        return None
+    if isinstance(error, (OSError, EOFError)):
+        return backoff_delay(attempt)
+    return None
+
+class SingleFlight:
+    """Unifică cererile identice aflate simultan în desfășurare.
+
+    Primul apelant pornește cererea; ceilalți așteaptă același rezultat
+    (sau aceeași excepție) în loc să trimită încă o cerere la API. Cererea
+    comună se anulează doar când renunță ultimul apelant care o așteaptă.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[Tuple[str, Any], ...], "asyncio.Future[Dict[str, Any]]"] = {}
+        self._waiters: Dict["asyncio.Future[Dict[str, Any]]", int] = {}
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: Tuple[Tuple[str, Any], ...], factory) -> Dict[str, Any]:
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(factory())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
         
-        req = urllib.request.Request(full_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=30) as response:
-            data = response.read().decode('utf-8')
-            return json.loads(data)
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # Anularea unui apelant nu anulează direct cererea comună
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._waiters[future] == 1 and not future.done():
+                # Ultimul apelant a renunțat: cererea nu mai folosește nimănui
+                future.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+
+    def _forget(self, key: Tuple[Tuple[str, Any], ...], future: "asyncio.Future[Dict[str, Any]]") -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()  # marchează excepția ca preluată
+
+api_single_flight = SingleFlight()
+
+async def fetch_and_cache(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Aduce date proaspete de la API și le salvează în cache.
+
+    Dacă în cache există deja corpul cu ETag / Last-Modified, cererea este
+    condiționată, iar la 304 se refolosește obiectul deja decodat.
+    """
+    previous = response_cache.revalidation_entry(params) if CACHE_ENABLED else None
+    try:
+        response = await request_internal_api(params, previous.validators if previous is not None else None)
     except Exception as e:
         return {"error": f"API call failed: {str(e)}"}
+    
+    if response.not_modified:
+        response_cache.revalidated += 1
+        result = previous.value
+    else:
+        result = response.data
+    if CACHE_ENABLED and "error" not in result:
+        response_cache.set(params, result, response.validators or None)
+    return result
+
+async def fetch_and_cache_coalesced(params: Dict[str, Any]) -> Dict[str, Any]:
+    """fetch_and_cache cu cererile identice simultane unificate"""
+    return await api_single_flight.do(
+        ResponseCache.key_for(params), lambda: fetch_and_cache(params)
+    )
+
+_background_refreshes: Dict[Tuple[Tuple[str, Any], ...], "asyncio.Task[None]"] = {}
+
+async def refresh_cached(params: Dict[str, Any]) -> None:
+    """Reîmprospătează o intrare din cache; la eroare rămâne intrarea veche"""
+    await fetch_and_cache_coalesced(response_cache.widen(params))
+
+def schedule_refresh(params: Dict[str, Any]) -> None:
+    """Pornește o singură reîmprospătare în fundal pentru aceiași parametri"""
+    key = ResponseCache.key_for(params)
+    if key in _background_refreshes:
+        return
+    task = asyncio.ensure_future(refresh_cached(params))
+    _background_refreshes[key] = task
+    task.add_done_callback(lambda _: _background_refreshes.pop(key, None))
+
+def mark_stale(hit: CacheHit) -> Dict[str, Any]:
+    """Copie a răspunsului învechit, cu vârsta lui în metadata"""
+    result = dict(hit.value)
+    metadata = result.get("metadata")
+    result["metadata"] = {
+        **(metadata if isinstance(metadata, dict) else {}),
+        "cache_stale": True,
+        "cache_age_seconds": round(hit.age, 1)
+    }
+    return result
+
+async def fetch_student_data(params: Dict[str, Any], no_cache: bool = False) -> Dict[str, Any]:
+    """Obține răspunsul API pentru parametrii validați, trecând prin cache"""
+    if not CACHE_ENABLED:
+        return await fetch_and_cache_coalesced(params)
+    
+    # Cache-ul e indexat pe parametrii deja validați și limitați; o intrare
+    # expirată dar în limita de învechire se servește imediat și se
+    # reîmprospătează în fundal (stale-while-revalidate)
+    if not no_cache:
+        hit = await response_cache.aget(params)
+        if hit is not None:
+            if not hit.stale:
+                return hit.value
+            schedule_refresh(params)
+            return mark_stale(hit)
+    
+    fetch_params = response_cache.widen(params)
+    result = await fetch_and_cache_coalesced(fetch_params)
+    if "error" in result or fetch_params is params:
+        return result
+    
+    narrowed = response_cache.narrow(params, result)
+    if narrowed is not None:
+        return narrowed
+    return await fetch_and_cache_coalesced(params)
+
+# Cererile pe module (all_modules cu fan-out, deadline_ms): modulele se cer
+# separat și în paralel; cele care nu ajung la termen continuă în fundal și
+# completează cache-ul, astfel încât apelul următor găsește răspunsul complet
+_late_modules: Set["asyncio.Task[Dict[str, Any]]"] = set()
+
+class DeadlineStats:
+    """Răspunsurile date cu deadline_ms și modulele sosite după termen"""
+    def __init__(self):
+        self.requests = 0
+        self.partial = 0
+        self.missing_modules = 0
+        self.late_cached = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "partial": self.partial,
+            "missing_modules": self.missing_modules,
+            "late_cached": self.late_cached,
+            "late_in_flight": len(_late_modules)
+        }
+
+deadline_stats = DeadlineStats()
+
+# Raportarea progresului pentru tool call-ul curent: (progres, total, mesaj);
+# None când clientul nu a trimis un progressToken
+progress_reporter: "contextvars.ContextVar[Optional[Callable[[float, float, str], Awaitable[None]]]]" = \
+    contextvars.ContextVar("progress_reporter", default=None)
+
+def split_modules(params: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Parametrii API ai fiecărui modul cerut, ca cereri separate"""
+    split = {}
+    for module in requested_modules(params):
+        module_params = ResponseCache.module_params(module, params)
+        del module_params["module"]
+        # Pentru all=1 modulele cu număr primesc fereastra maximă
+        module_params[module] = params.get(module, 10 if module in COUNT_MODULES else 1)
+        split[module] = module_params
+    return split
+
+def _late_module_done(task: "asyncio.Task[Dict[str, Any]]") -> None:
+    _late_modules.discard(task)
+    if not task.cancelled() and task.exception() is None and "error" not in task.result():
+        deadline_stats.late_cached += 1
+
+async def fetch_modules(params: Dict[str, Any], no_cache: bool, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Modulele cerute separat și în paralel, reunite în forma unui răspuns obișnuit.
+
+    Cu deadline (secunde) se returnează doar modulele sosite la timp, iar cele
+    lipsă apar în metadata.missing_modules. Fiecare modul sosit este anunțat
+    prin progress_reporter, dacă clientul a cerut notificări de progres.
+    """
+    tasks = {
+        module: asyncio.ensure_future(fetch_student_data(module_params, no_cache))
+        for module, module_params in split_modules(params).items()
+    }
+    report = progress_reporter.get()
+    loop = asyncio.get_running_loop()
+    ends_at = None if deadline is None else loop.time() + deadline
+    pending = set(tasks.values())
+    arrived = 0
+    try:
+        while pending:
+            timeout = None if ends_at is None else ends_at - loop.time()
+            if timeout is not None and timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if report is not None:
+                for module, task in tasks.items():
+                    if task in done:
+                        arrived += 1
+                        await report(arrived, len(tasks), f"Modul primit: {module}")
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    
+    result: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = {}
+    missing: List[str] = []
+    errors: Dict[str, str] = {}
+    for module, task in tasks.items():
+        if task in pending:
+            missing.append(module)
+            _late_modules.add(task)
+            task.add_done_callback(_late_module_done)
+            continue
+        if task.exception() is not None:
+            errors[module] = f"Eroare internă: {str(task.exception())}"
+            continue
+        value = task.result()
+        if "error" in value:
+            errors[module] = value["error"]
+            continue
+        for name, data in value.items():
+            if name == "metadata" and isinstance(data, dict):
+                metadata.update(data)
+            elif name not in MODULE_TTL or name == module:
+                result[name] = data
+    
+    if deadline is not None:
+        deadline_stats.requests += 1
+        if missing:
+            deadline_stats.partial += 1
+            deadline_stats.missing_modules += len(missing)
+    if errors and len(errors) == len(tasks):
+        return {"error": next(iter(errors.values()))}
+    
+    if deadline is not None:
+        metadata["missing_modules"] = missing
+    if errors:
+        metadata["module_errors"] = errors
+    result["metadata"] = metadata
+    return result
+
+# Proiecția câmpurilor (fields): căi de forma "user_profile.nume",
+# "activitati_recente.*.tip_activitate" sau "$.analiza_lacunelor[0]".
+# Rezultatul refolosește sub-obiectele din cache, fără copii adânci.
+def parse_field_paths(fields: Union[str, List[str]]) -> List[List[str]]:
+    """Transformă căile de câmpuri în liste de segmente"""
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    paths = []
+    for field in fields:
+        field = str(field).strip()
+        if field.startswith("$"):
+            field = field[1:].lstrip(".")
+        field = field.replace("[*]", ".*").replace("[]", ".*").replace("[", ".").replace("]", "")
+        segments = [segment for segment in field.split(".") if segment]
+        if not segments:
+            raise ValueError(f"Cale invalidă în fields: {field!r}")
+        paths.append(segments)
+    return paths
+
+def _field_spec(paths: List[List[str]]) -> Dict[str, Any]:
+    """Arbore de selecție: True la frunze, dicționar pentru nivelurile intermediare"""
+    spec: Dict[str, Any] = {}
+    for segments in paths:
+        node = spec
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if child is True:
+                break
+            node = node.setdefault(segment, {})
+        else:
+            node[segments[-1]] = True
+    return spec
+
+def _merge_specs(first: Any, second: Any) -> Any:
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if first is True or second is True:
+        return True
+    merged = dict(first)
+    for key, value in second.items():
+        merged[key] = _merge_specs(merged.get(key), value)
+    return merged
+
+def _apply_spec(value: Any, spec: Any) -> Any:
+    if spec is True:
+        return value
+    wildcard = spec.get("*")
+    if isinstance(value, dict):
+        keys = value.keys() if wildcard is not None else [key for key in spec if key in value]
+        return {key: _apply_spec(value[key], _merge_specs(spec.get(key), wildcard)) for key in keys}
+    if isinstance(value, list):
+        if wildcard is None and not any(key.isdigit() for key in spec):
+            # Cheile simple se aplică fiecărui element al listei
+            return [_apply_spec(item, spec) for item in value]
+        if wildcard is not None:
+            return [_apply_spec(item, _merge_specs(spec.get(str(index)), wildcard))
+                    for index, item in enumerate(value)]
+        return [_apply_spec(value[int(key)], spec[key])
+                for key in spec if key.isdigit() and int(key) < len(value)]
+    return value
+
+def _path_exists(value: Any, segments: List[str]) -> bool:
+    for position, segment in enumerate(segments):
+        if segment == "*":
+            items = value.values() if isinstance(value, dict) else value if isinstance(value, list) else []
+            return any(_path_exists(item, segments[position + 1:]) for item in items)
+        if isinstance(value, dict) and segment in value:
+            value = value[segment]
+        elif isinstance(value, list) and segment.isdigit() and int(segment) < len(value):
+            value = value[int(segment)]
+        elif isinstance(value, list) and not segment.isdigit():
+            return any(_path_exists(item, segments[position:]) for item in value)
+        else:
+            return False
+    return True
+
+def project_fields(data: Dict[str, Any], paths: List[List[str]]) -> Tuple[Dict[str, Any], List[str]]:
+    """Păstrează doar căile cerute (plus metadata); întoarce și căile negăsite"""
+    spec = _field_spec(paths)
+    if "metadata" in data:
+        spec["metadata"] = True
+    missing = [".".join(segments) for segments in paths if not _path_exists(data, segments)]
+    return _apply_spec(data, spec), missing
 
 async def get_student_data(
     user_id: int,
@@ -190,7 +2124,10 @@ async def get_student_data(
     only: Optional[str] = None,
     focus: Optional[str] = None,
     instructiuni_llm: bool = False,
-    all_modules: bool = False
+    all_modules: bool = False,
+    no_cache: bool = False,
+    fields: Optional[Union[str, List[str]]] = None,
+    deadline_ms: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Obține datele studentului conform API-ului modular intern
@@ -198,20 +2135,44 @@ async def get_student_data(
     Args:
         user_id: ID-ul utilizatorului (obligatoriu)
         user_profile: Include profilul utilizatorului (True/False)
-        activitati_recente: Numărul de activități recente de returnat (1-10)
+        activitati_recente: Numărul de activități recente de returnat (1-10). 
+                           Exemplu: 1=ultima activitate, 5=ultimele 5 activități, 10=ultimele 10 activități
         profil_comportamental: Include profilul comportamental (necesită materie)
         progres_teorie: Include progresul la teorie (True/False)
         analiza_lacunelor: Include analiza lacunelor (True/False)
-        utilizatori_compatibili: Numărul de utilizatori compatibili (1-10)
+        utilizatori_compatibili: Numărul de utilizatori compatibili (1-10) pentru peer matching și colaborare
         materie: ID-ul materiei pentru filtrare (opțional)
-        only: Filtrare pe tip activitate
-        focus: Pentru utilizatori_compatibili - filtrare geografică/temporală
-        instructiuni_llm: Transformă recomandările în instrucțiuni pentru LLM
+        only: Filtrare pe tip activitate: 'a_simulat_examenul', 'are_lacune_de_clarificat', 
+              'a_citit_materia', 's_a_testat_pe_lectie_capitol', 'a_notat_la_lectii', 
+              'are_provocari_sustinute', 'este_in_eroare_la'
+        focus: Pentru utilizatori_compatibili - filtrare geografică/temporală: 'toate', 'judet', 'an_admitere', 'judet_si_an'
+        instructiuni_llm: Transformă recomandările în instrucțiuni pentru LLM (True/False)
         all_modules: Include toate modulele disponibile (True/False)
+        no_cache: Ignoră cache-ul și reîmprospătează datele de la API (True/False)
+        fields: Căi de câmpuri de păstrat în răspuns, de ex. ["user_profile.nume", "activitati_recente.*.tip_activitate"]
+        deadline_ms: Termen în milisecunde; modulele sosite până atunci se returnează, cele lipsă apar în metadata.missing_modules
     
     Returns:
         Datele studentului conform modulelor solicitate
+        
+    Examples:
+        - get_student_data(4001, user_profile=True) → doar profilul
+        - get_student_data(4001, activitati_recente=1) → ultima activitate
+        - get_student_data(4001, activitati_recente=5, only="a_simulat_examenul") → ultimele 5 simulări
+        - get_student_data(4001, utilizatori_compatibili=3, focus="judet") → 3 utilizatori compatibili din același județ
+        - get_student_data(4001, activitati_recente=3, instructiuni_llm=True) → activități cu instrucțiuni LLM
+        - get_student_data(4001, all_modules=True) → toate datele
+        - get_student_data(4001, user_profile=True, no_cache=True) → profil proaspăt, fără cache
     """
+    paths = None
+    if fields:
+        try:
+            paths = parse_field_paths(fields)
+        except ValueError as e:
+            return {"error": str(e)}
+    if deadline_ms is not None and deadline_ms <= 0:
+        return {"error": "deadline_ms trebuie să fie un număr pozitiv"}
+    
     # Construiește parametrii conform API-ului intern
     params = {"user_id": user_id}
     
@@ -256,12 +2217,17 @@ async def get_student_data(
         if only in valid_only_values:
             params["only"] = only
     
-    result = await call_internal_api(params)
+    if deadline_ms is not None and requested_modules(params):
+        result = await fetch_modules(params, no_cache, deadline_ms / 1000)
+    elif all_modules and ALL_MODULES_FANOUT:
+        result = await fetch_modules(params, no_cache)
+    else:
+        result = await fetch_student_data(params, no_cache)
     
     if "error" in result:
         return {"error": result["error"]}
     
-    return {
+    response = {
         "tool": "get_student_data",
         "user_id": user_id,
         "modules_requested": {
@@ -282,23 +2248,258 @@ async def get_student_data(
         "data": result,
         "metadata": result.get("metadata", {})
     }
+    
+    if paths:
+        response["data"], missing = project_fields(result, paths)
+        response["fields"] = {"requested": [".".join(segments) for segments in paths], "missing": missing}
+    
+    return response
+
+async def get_students_data(
+    user_ids: List[int],
+    user_profile: bool = False,
+    activitati_recente: Optional[int] = None,
+    profil_comportamental: bool = False,
+    progres_teorie: bool = False,
+    analiza_lacunelor: bool = False,
+    utilizatori_compatibili: Optional[int] = None,
+    materie: Optional[int] = None,
+    only: Optional[str] = None,
+    focus: Optional[str] = None,
+    instructiuni_llm: bool = False,
+    all_modules: bool = False,
+    no_cache: bool = False,
+    max_concurrency: Optional[int] = None,
+    fields: Optional[Union[str, List[str]]] = None,
+    deadline_ms: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Obține datele pentru mai mulți studenți într-un singur apel
+    
+    Args:
+        user_ids: Lista ID-urilor de utilizator (maxim BATCH_MAX_USERS)
+        max_concurrency: Numărul maxim de utilizatori procesați simultan (opțional)
+        Restul parametrilor sunt identici cu get_student_data și se aplică fiecărui utilizator
+    
+    Returns:
+        Rezultatele per utilizator, cu erorile raportate separat pentru fiecare
+
+    Examples:
+        - get_students_data([4001, 4002, 4003], user_profile=True) → profilurile grupului
+        - get_students_data([4001, 4002], analiza_lacunelor=True, materie=1) → lacunele la o materie
+    """
+    # Păstrează ordinea, fără duplicate
+    unique_ids = list(dict.fromkeys(user_ids))
+    if not unique_ids:
+        return {"error": "Lista user_ids este goală"}
+    if len(unique_ids) > BATCH_MAX_USERS:
+        return {"error": f"Prea mulți utilizatori: maxim {BATCH_MAX_USERS} per apel"}
+    
+    limit = BATCH_CONCURRENCY if max_concurrency is None else min(max(max_concurrency, 1), BATCH_CONCURRENCY)
+    slots = asyncio.Semaphore(limit)
+    
+    async def fetch_one(user_id: int) -> Dict[str, Any]:
+        # Progresul pe module al fiecărui utilizator ar reporni de la zero: nu se raportează
+        progress_reporter.set(None)
+        async with slots:
+            return await get_student_data(
+                user_id,
+                user_profile=user_profile,
+                activitati_recente=activitati_recente,
+                profil_comportamental=profil_comportamental,
+                progres_teorie=progres_teorie,
+                analiza_lacunelor=analiza_lacunelor,
+                utilizatori_compatibili=utilizatori_compatibili,
+                materie=materie,
+                only=only,
+                focus=focus,
+                instructiuni_llm=instructiuni_llm,
+                all_modules=all_modules,
+                no_cache=no_cache,
+                fields=fields,
+                deadline_ms=deadline_ms
+            )
+    
+    outcomes = await asyncio.gather(*[fetch_one(user_id) for user_id in unique_ids], return_exceptions=True)
+    
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for user_id, outcome in zip(unique_ids, outcomes):
+        if isinstance(outcome, Exception):
+            errors[str(user_id)] = f"Eroare internă: {str(outcome)}"
+        elif "error" in outcome:
+            errors[str(user_id)] = outcome["error"]
+        else:
+            results[str(user_id)] = outcome
+    
+    return {
+        "tool": "get_students_data",
+        "user_ids": unique_ids,
+        "results": results,
+        "errors": errors,
+        "metadata": {
+            "requested": len(unique_ids),
+            "succeeded": len(results),
+            "failed": len(errors)
+        }
+    }
+
+def get_metrics() -> Dict[str, Any]:
+    """Instantaneu al metricilor serverului (transfer HTTP, reîncercări, serializare, stdout și cache)"""
+    return {
+        "transfer": transfer_stats.snapshot(),
+        "serialization": serialization_stats.snapshot(),
+        "api": {
+            **retry_stats.snapshot(),
+            "cancelled_fetches": api_single_flight.cancelled,
+            "circuit_breaker": api_breaker.snapshot(),
+            "limiter": api_limiter.snapshot(),
+            "hedging": hedge_stats.snapshot()
+        },
+        "deadline": deadline_stats.snapshot(),
+        "stdout": output_stats.snapshot(),
+        "cache": {
+            "hits": response_cache.hits,
+            "assembled": response_cache.assembled,
+            "disk_hits": response_cache.disk_hits,
+            "misses": response_cache.misses,
+            "revalidated": response_cache.revalidated,
+            "coalesced": api_single_flight.coalesced
+        }
+    }
+
+async def get_metrics_resource() -> str:
+    """Resource pentru metricile serverului"""
+    return dumps_result(get_metrics())
 
 async def get_user_profile_resource(user_id: int) -> str:
     """Resource pentru profilul utilizatorului"""
     result = await get_student_data(user_id, user_profile=True)
-    return json.dumps(result, indent=2, ensure_ascii=False)
+    return dumps_result(result)
 
 async def get_user_complete_data_resource(user_id: int) -> str:
     """Resource pentru toate datele utilizatorului"""
     result = await get_student_data(user_id, all_modules=True)
-    return json.dumps(result, indent=2, ensure_ascii=False)
+    return dumps_result(result)
+
+class OutputStats:
+    """Mesaje trimise pe stdout, scrieri efective și așteptări din cauza clientului lent"""
+    def __init__(self):
+        self.messages = 0
+        self.writes = 0
+        self.bytes = 0
+        self.write_seconds = 0.0
+        self.max_pending_bytes = 0
+        self.backpressure_waits = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "messages": self.messages,
+            "writes": self.writes,
+            "bytes": self.bytes,
+            "write_ms": round(self.write_seconds * 1000, 2),
+            "max_pending_bytes": self.max_pending_bytes,
+            "backpressure_waits": self.backpressure_waits
+        }
+
+output_stats = OutputStats()
+
+class StdoutWriter:
+    """Scriere asincronă pe stdout: mesajele intră într-o coadă golită de un thread
+    dedicat, iar cele sosite între două scrieri pleacă împreună, cu un singur flush"""
+    def __init__(self, stream, buffer_bytes: int = STDOUT_BUFFER_BYTES):
+        self.stream = stream
+        self.buffer_bytes = buffer_bytes
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stdout")
+        self.closed = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Pornește task-ul de scriere (în event loop-ul curent)"""
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def write(self, message: bytes) -> None:
+        """Pune un mesaj în coadă; așteaptă cât timp clientul are prea mult de citit"""
+        while self.pending_bytes >= self.buffer_bytes and not self.closed:
+            output_stats.backpressure_waits += 1
+            self._drained.clear()
+            await self._drained.wait()
+        if self.closed:
+            return
+        # Mesajul și terminatorul se scriu separat, fără a copia mesajul
+        self.pending.append(message)
+        self.pending.append(b"\n")
+        self.pending_bytes += len(message) + 1
+        output_stats.messages += 1
+        output_stats.max_pending_bytes = max(output_stats.max_pending_bytes, self.pending_bytes)
+        self._wakeup.set()
+
+    def _write_blocking(self, messages: List[bytes]) -> None:
+        self.stream.writelines(messages)
+        self.stream.flush()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.pending:
+                if self.closed:
+                    return
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            
+            messages = self.pending
+            self.pending = []
+            size = sum(len(message) for message in messages)
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(self.executor, self._write_blocking, messages)
+            except (OSError, ValueError) as e:
+                # Clientul a închis stdout: renunțăm la ce a mai rămas
+                print(f"Ieșire stdout închisă: {e}", file=sys.stderr)
+                self.closed = True
+                self.pending = []
+                self.pending_bytes = 0
+                self._drained.set()
+                return
+            output_stats.writes += 1
+            output_stats.bytes += size
+            output_stats.write_seconds += time.perf_counter() - started
+            self.pending_bytes -= size
+            if self.pending_bytes < self.buffer_bytes:
+                self._drained.set()
+
+    async def aclose(self) -> None:
+        """Scrie tot ce a rămas în coadă și oprește thread-ul de scriere"""
+        self.closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+        self.executor.shutdown(wait=False)
+
+async def read_stdin_lines():
+    """Citește linii de la stdin fără a bloca event loop-ul"""
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            return
+        line = line.strip()
+        if line:
+            yield line
 
 async def main():
     """Funcția principală care rulează serverul MCP"""
     global JWT_TOKEN
     
     # Citește JWT token din variabila de mediu
-    import os
     JWT_TOKEN = os.environ.get('ACADEMIADEPOLITIE_JWT_TOKEN')
     
     if not JWT_TOKEN:
@@ -308,27 +2509,120 @@ async def main():
     server = MCPServer()
     
     # Înregistrează tool-ul principal
+    student_data_properties = {
+        "user_id": {"type": "integer", "description": "ID-ul utilizatorului (obligatoriu)"},
+        "user_profile": {"type": "boolean", "description": "Include profilul utilizatorului"},
+        "activitati_recente": {"type": "integer", "minimum": 1, "maximum": 10, "description": "Numărul de activități recente"},
+        "profil_comportamental": {"type": "boolean", "description": "Include profilul comportamental"},
+        "progres_teorie": {"type": "boolean", "description": "Include progresul la teorie"},
+        "analiza_lacunelor": {"type": "boolean", "description": "Include analiza lacunelor"},
+        "utilizatori_compatibili": {"type": "integer", "minimum": 1, "maximum": 10, "description": "Numărul de utilizatori compatibili"},
+        "materie": {"type": "integer", "description": "ID-ul materiei pentru filtrare"},
+        "only": {"type": "string", "description": "Filtrare pe tip activitate"},
+        "focus": {"type": "string", "enum": ["toate", "judet", "an_admitere", "judet_si_an"], "description": "Filtrare geografică/temporală"},
+        "instructiuni_llm": {"type": "boolean", "description": "Transformă recomandările în instrucțiuni LLM"},
+        "all_modules": {"type": "boolean", "description": "Include toate modulele"},
+        "no_cache": {"type": "boolean", "description": "Ignoră cache-ul și cere date proaspete"},
+        "fields": {"type": "array", "items": {"type": "string"},
+                   "description": "Păstrează doar aceste căi, de ex. user_profile.nume sau activitati_recente.*.tip_activitate"},
+        "deadline_ms": {"type": "integer", "minimum": 1,
+                        "description": "Returnează modulele sosite în acest termen (ms); cele lipsă apar în metadata.missing_modules"}
+    }
+    
+    # Schema rezultatului: câte o proprietate pentru fiecare modul al API-ului;
+    # forma internă a modulelor rămâne cea trimisă de backend
+    student_data_output = {
+        "type": "object",
+        "properties": {
+            "tool": {"type": "string"},
+            "user_id": {"type": "integer"},
+            "modules_requested": {"type": "object"},
+            "filters": {"type": "object"},
+            "data": {
+                "type": "object",
+                "properties": {
+                    **{name: {"description": f"Modulul {name}"} for name in MODULE_TTL},
+                    "metadata": {"type": "object"}
+                }
+            },
+            "metadata": {"type": "object"},
+            "fields": {
+                "type": "object",
+                "properties": {
+                    "requested": {"type": "array", "items": {"type": "string"}},
+                    "missing": {"type": "array", "items": {"type": "string"}}
+                }
+            },
+            "truncated": {
+                "type": "object",
+                "properties": {
+                    "max_bytes": {"type": "integer"},
+                    "original_bytes": {"type": "integer"},
+                    "max_list_items": {"type": "integer"}
+                }
+            }
+        },
+        "required": ["tool", "user_id", "data", "metadata"]
+    }
+    
     server.register_tool(
         "get_student_data",
         "Obține datele studentului conform API-ului modular intern AcademiaDePoliție",
         {
+            "properties": student_data_properties,
+            "required": ["user_id"]
+        },
+        get_student_data,
+        output_schema=student_data_output
+    )
+    
+    # Tool-ul batch primește aceiași parametri, cu o listă de utilizatori
+    batch_properties = {
+        "user_ids": {"type": "array", "items": {"type": "integer"}, "minItems": 1, "maxItems": BATCH_MAX_USERS,
+                     "description": "Lista ID-urilor de utilizator"},
+        **{name: schema for name, schema in student_data_properties.items() if name != "user_id"},
+        "max_concurrency": {"type": "integer", "minimum": 1, "maximum": BATCH_CONCURRENCY,
+                            "description": "Utilizatori procesați simultan"}
+    }
+    server.register_tool(
+        "get_students_data",
+        "Obține datele pentru mai mulți studenți AcademiaDePoliție într-un singur apel",
+        {
+            "properties": batch_properties,
+            "required": ["user_ids"]
+        },
+        get_students_data,
+        output_schema={
+            "type": "object",
             "properties": {
-                "user_id": {"type": "integer", "description": "ID-ul utilizatorului (obligatoriu)"},
-                "user_profile": {"type": "boolean", "description": "Include profilul utilizatorului"},
-                "activitati_recente": {"type": "integer", "minimum": 1, "maximum": 10, "description": "Numărul de activități recente"},
-                "profil_comportamental": {"type": "boolean", "description": "Include profilul comportamental"},
-                "progres_teorie": {"type": "boolean", "description": "Include progresul la teorie"},
-                "analiza_lacunelor": {"type": "boolean", "description": "Include analiza lacunelor"},
-                "utilizatori_compatibili": {"type": "integer", "minimum": 1, "maximum": 10, "description": "Numărul de utilizatori compatibili"},
-                "materie": {"type": "integer", "description": "ID-ul materiei pentru filtrare"},
-                "only": {"type": "string", "description": "Filtrare pe tip activitate"},
-                "focus": {"type": "string", "enum": ["toate", "judet", "an_admitere", "judet_si_an"], "description": "Filtrare geografică/temporală"},
-                "instructiuni_llm": {"type": "boolean", "description": "Transformă recomandările în instrucțiuni LLM"},
-                "all_modules": {"type": "boolean", "description": "Include toate modulele"}
+                "tool": {"type": "string"},
+                "user_ids": {"type": "array", "items": {"type": "integer"}},
+                "results": {"type": "object", "additionalProperties": student_data_output},
+                "errors": {"type": "object", "additionalProperties": {"type": "string"}},
+                "metadata": {"type": "object"}
             },
-            "required": ["user_id"]
+            "required": ["tool", "user_ids", "results", "errors", "metadata"]
+        }
+    )
+    
+    server.register_tool(
+        "invalidate_cache",
+        "Golește cache-ul de răspunsuri pentru un utilizator (sau complet), după o modificare a datelor",
+        {
+            "properties": {
+                "user_id": {"type": "integer", "description": "ID-ul utilizatorului; lipsă = tot cache-ul"}
+            }
         },
-        get_student_data
+        invalidate_cache_tool,
+        output_schema={
+            "type": "object",
+            "properties": {
+                "tool": {"type": "string"},
+                "user_id": {"type": ["integer", "null"]},
+                "invalidated": {"type": "integer"}
+            },
+            "required": ["tool", "invalidated"]
+        }
     )
     
     # Înregistrează resources
@@ -346,32 +2640,69 @@ async def main():
         lambda: get_user_complete_data_resource(4001)  # Default user pentru demo
     )
     
-    # Citește cereri JSON-RPC de la stdin și răspunde la stdout
-    while True:
+    server.register_resource(
+        "server://metrics",
+        "Server Metrics",
+        "Metrici de performanță: transfer HTTP (compresie), reîncercări și circuit breaker, serializare, stdout și cache",
+        get_metrics_resource
+    )
+    
+    # Citește cereri JSON-RPC de la stdin și răspunde la stdout.
+    # Fiecare cerere rulează ca task separat; răspunsurile se scriu pe
+    # măsură ce sunt gata, clientul le asociază după "id".
+    slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    writer = StdoutWriter(sys.stdout.buffer)
+    writer.start()
+    server.notify = lambda message: writer.write(encode_message(message))
+    in_flight = set()
+    
+    async def reply(request: Any, response: Optional[bytes]) -> None:
+        # Notificările (fără "id") și batch-urile formate doar din notificări nu primesc răspuns
+        if response is not None and (not isinstance(request, dict) or "id" in request):
+            await writer.write(response)
+    
+    async def process(request: Any) -> None:
         try:
-            line = sys.stdin.readline()
-            if not line:
-                break
-                
-            request = json.loads(line.strip())
-            response = await server.handle_request(request)
+            if isinstance(request, list):
+                # Batch JSON-RPC: membrii rulează în paralel, fiecare cu propriul slot
+                await reply(request, await server.handle_batch(request, slots))
+                return
+            # Slotul se așteaptă aici, nu în bucla de citire, iar stdin se citește în
+            # continuare: notifications/cancelled ajunge imediat și anulează și cererile
+            # care încă așteaptă un slot. Slotul se eliberează abia după ce răspunsul a
+            # intrat în coada de ieșire, astfel că un client lent încetinește procesarea
+            async with slots:
+                await reply(request, await server.handle_message(request))
+        except Exception as e:
+            await reply(request, encode_message(internal_error(None, f"Server error: {str(e)}")))
+    
+    try:
+        async for line in read_stdin_lines():
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                continue
             
-            print(json.dumps(response), flush=True)
+            # Anularea se aplică imediat, oricâte cereri ar fi în lucru sau la coadă
+            if isinstance(request, dict) and request.get("method") == "notifications/cancelled":
+                server.cancel_request(request.get("params") or {})
+                continue
             
-        except json.JSONDecodeError:
-            continue
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "id": None,
-                "error": {
-                    "code": -32603,
-                    "message": f"Server error: {str(e)}"
-                }
-            }
-            print(json.dumps(error_response), flush=True)
+            task = asyncio.ensure_future(process(request))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            if isinstance(request, dict) and "id" in request:
+                server.track(request["id"], task)
+    except KeyboardInterrupt:
+        pass
+    
+    if in_flight:
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    await writer.aclose()
+    
+    await close_http_client()
+    if response_cache.disk is not None:
+        response_cache.disk.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
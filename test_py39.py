@@ -5,7 +5,582 @@ Test pentru MCP server Python 3.9 compatibil
 
 import asyncio
 import json
-from server_py39 import get_student_data
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import server_py39
+from server_py39 import get_student_data, close_http_client, invalidate_cache
+
+class ConditionalStubHandler(BaseHTTPRequestHandler):
+    """Backend local minimal: trimite ETag și răspunde 304 la If-None-Match"""
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+    served = {200: 0, 304: 0}
+    
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.served[304] += 1
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        
+        self.served[200] += 1
+        body = json.dumps({
+            "user_profile": {"user_id": 4001, "versiune": self.etag},
+            "metadata": {}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+async def test_conditional_requests():
+    """Testează revalidarea cu ETag / 304 contra unui backend local"""
+    print("🧪 Testez cererile condiționate (ETag / If-None-Match)...")
+    
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), ConditionalStubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    original_base = server_py39.INTERNAL_API_BASE
+    server_py39.INTERNAL_API_BASE = f"http://127.0.0.1:{stub.server_address[1]}"
+    invalidate_cache(4001)
+    
+    try:
+        # no_cache forțează mereu reîmprospătarea, deci cererea condiționată
+        first = await get_student_data(4001, user_profile=True, no_cache=True)
+        second = await get_student_data(4001, user_profile=True, no_cache=True)
+        assert ConditionalStubHandler.served == {200: 1, 304: 1}, ConditionalStubHandler.served
+        assert second["data"] is first["data"], "La 304 trebuie refolosit obiectul din cache"
+        print("✅ 304 Not Modified: corpul din cache a fost refolosit")
+        
+        ConditionalStubHandler.etag = '"v2"'
+        third = await get_student_data(4001, user_profile=True, no_cache=True)
+        assert ConditionalStubHandler.served == {200: 2, 304: 1}, ConditionalStubHandler.served
+        assert third["data"]["user_profile"]["versiune"] == '"v2"'
+        print("✅ ETag schimbat: date noi descărcate")
+    finally:
+        server_py39.INTERNAL_API_BASE = original_base
+        invalidate_cache(4001)
+        stub.shutdown()
+        await close_http_client()
+
+class ModuleStubHandler(BaseHTTPRequestHandler):
+    """Backend local cu module: istoric fix de activități, statusuri programate și întârziere"""
+    protocol_version = "HTTP/1.1"
+    # Cele mai recente activități primele; tipul și materia alternează
+    history = [
+        {"id": 20 - index,
+         "tip_activitate": ("a_simulat_examenul", "a_citit_materia")[index % 2],
+         "materie_id": 1 + index % 3}
+        for index in range(20)
+    ]
+    requests = []
+    statuses = []
+    retry_after = None
+    delay = 0.0
+    omit = set()
+    # Per modul: întârziere suplimentară și status fix (pentru cererile separate pe module)
+    module_delay = {}
+    module_status = {}
+    
+    @classmethod
+    def reset(cls):
+        cls.requests, cls.statuses, cls.retry_after, cls.delay, cls.omit = [], [], None, 0.0, set()
+        cls.module_delay, cls.module_status = {}, {}
+    
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionError:
+            pass  # Clientul a închis conexiunea (cerere anulată)
+    
+    def do_GET(self):
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        self.requests.append(query)
+        delay = max([self.delay] + [seconds for name, seconds in self.module_delay.items() if name in query])
+        if delay:
+            time.sleep(delay)
+        statuses = [status for name, status in self.module_status.items() if name in query]
+        status = statuses[0] if statuses else self.statuses.pop(0) if self.statuses else 200
+        if status != 200:
+            self.send_response(status)
+            if self.retry_after is not None:
+                self.send_header("Retry-After", self.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        
+        payload = {"metadata": {"user_id": int(query["user_id"])}}
+        for name in ("user_profile", "profil_comportamental", "progres_teorie", "analiza_lacunelor"):
+            if name in query and name not in self.omit:
+                payload[name] = {"user_id": int(query["user_id"]), "nume": f"Student {query['user_id']}"}
+        if "activitati_recente" in query and "activitati_recente" not in self.omit:
+            items = [item for item in self.history
+                     if query.get("only", item["tip_activitate"]) == item["tip_activitate"]
+                     and query.get("materie", str(item["materie_id"])) == str(item["materie_id"])]
+            payload["activitati_recente"] = items[:int(query["activitati_recente"])]
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def start_module_stub():
+    """Pornește ModuleStubHandler și îndreaptă serverul spre el; returnează (stub, adresa veche)"""
+    ModuleStubHandler.reset()
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), ModuleStubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    original_base = server_py39.INTERNAL_API_BASE
+    server_py39.INTERNAL_API_BASE = f"http://127.0.0.1:{stub.server_address[1]}"
+    return stub, original_base
+
+async def stop_module_stub(stub, original_base):
+    server_py39.INTERNAL_API_BASE = original_base
+    stub.shutdown()
+    await close_http_client()
+
+async def test_widening_fallback():
+    """Un modul lipsă din răspunsul lărgit nu oprește lărgirea pentru apelurile următoare"""
+    print("🧪 Testez revenirea după o cerere lărgită de activități...")
+    
+    stub, original_base = start_module_stub()
+    invalidate_cache(4010)
+    invalidate_cache(4011)
+    try:
+        ModuleStubHandler.omit = {"profil_comportamental"}
+        result = await get_student_data(4010, user_profile=True, profil_comportamental=True, activitati_recente=3)
+        assert len(result["data"]["activitati_recente"]) == 3, result
+        sent = [query["activitati_recente"] for query in ModuleStubHandler.requests]
+        assert sent == ["10", "3"], sent
+        assert server_py39.response_cache.widening_supported
+        print("✅ Modul lipsă: doar acest apel a repetat cererea originală")
+        
+        ModuleStubHandler.omit = set()
+        await get_student_data(4011, activitati_recente=2)
+        assert ModuleStubHandler.requests[-1]["activitati_recente"] == "10", ModuleStubHandler.requests
+        print("✅ Apelurile următoare cer în continuare fereastra lărgită")
+    finally:
+        invalidate_cache(4010)
+        invalidate_cache(4011)
+        await stop_module_stub(stub, original_base)
+
+async def test_cache_subsumption():
+    """Variantele mai înguste de activități se servesc din lista salvată, fără apel la API"""
+    print("🧪 Testez servirea activităților din cache-ul mai larg...")
+    
+    stub, original_base = start_module_stub()
+    invalidate_cache(4012)
+    try:
+        full = await get_student_data(4012, activitati_recente=10)
+        assert len(ModuleStubHandler.requests) == 1
+        history = full["data"]["activitati_recente"]
+        
+        fewer = await get_student_data(4012, activitati_recente=3)
+        assert fewer["data"]["activitati_recente"] == history[:3]
+        print("✅ activitati_recente mai mic: primele elemente din lista salvată")
+        
+        only = await get_student_data(4012, activitati_recente=2, only="a_citit_materia")
+        expected = [item for item in history if item["tip_activitate"] == "a_citit_materia"][:2]
+        assert only["data"]["activitati_recente"] == expected, only
+        
+        by_subject = await get_student_data(4012, activitati_recente=3, materie=2)
+        expected = [item for item in history if item["materie_id"] == 2][:3]
+        assert by_subject["data"]["activitati_recente"] == expected, by_subject
+        
+        both = await get_student_data(4012, activitati_recente=1, only="a_simulat_examenul", materie=3)
+        expected = [item for item in history
+                    if item["tip_activitate"] == "a_simulat_examenul" and item["materie_id"] == 3][:1]
+        assert both["data"]["activitati_recente"] == expected, both
+        assert len(ModuleStubHandler.requests) == 1, ModuleStubHandler.requests
+        print("✅ Filtrele only / materie aplicate local pe lista nefiltrată")
+        
+        # Lista salvată are doar 10 elemente: 4 simulări la materia 1 nu se pot garanta local
+        await get_student_data(4012, activitati_recente=4, only="a_simulat_examenul", materie=1)
+        assert len(ModuleStubHandler.requests) == 2, ModuleStubHandler.requests
+        print("✅ Prea puține elemente după filtrare: cererea ajunge la API")
+    finally:
+        invalidate_cache(4012)
+        await stop_module_stub(stub, original_base)
+
+async def test_fields_projection():
+    """Proiecția fields: wildcard, index în listă și căi negăsite"""
+    print("🧪 Testez proiecția câmpurilor (fields)...")
+    
+    stub, original_base = start_module_stub()
+    invalidate_cache(4013)
+    try:
+        result = await get_student_data(4013, user_profile=True, activitati_recente=3, fields=[
+            "user_profile.nume",
+            "activitati_recente.*.tip_activitate",
+            "activitati_recente[0].id",
+            "user_profile.inexistent",
+            "activitati_recente.5.id"
+        ])
+        data = result["data"]
+        assert data["user_profile"] == {"nume": "Student 4013"}, data
+        assert data["activitati_recente"][0] == {"id": 20, "tip_activitate": "a_simulat_examenul"}, data
+        assert data["activitati_recente"][1:] == [{"tip_activitate": "a_citit_materia"},
+                                                  {"tip_activitate": "a_simulat_examenul"}], data
+        assert "metadata" in data, "metadata se păstrează mereu"
+        assert result["fields"]["missing"] == ["user_profile.inexistent", "activitati_recente.5.id"], result["fields"]
+        print("✅ Wildcard și index aplicate, căile negăsite raportate în fields.missing")
+        
+        invalid = await get_student_data(4013, user_profile=True, fields=["."])
+        assert "error" in invalid, invalid
+        print("✅ Cale invalidă: eroare clară")
+    finally:
+        invalidate_cache(4013)
+        await stop_module_stub(stub, original_base)
+
+async def test_retries_and_breaker():
+    """Reîncercări la 503, Retry-After respectat, circuit breaker deschis și semi-deschis"""
+    print("🧪 Testez reîncercările și circuit breaker-ul...")
+    
+    stub, original_base = start_module_stub()
+    original = (server_py39.RETRY_BACKOFF_BASE, server_py39.RETRY_ATTEMPTS,
+                server_py39.api_breaker, server_py39.api_limiter)
+    server_py39.RETRY_BACKOFF_BASE = 0.01
+    try:
+        retries = server_py39.retry_stats.retries
+        ModuleStubHandler.statuses = [503]
+        result = await get_student_data(4014, user_profile=True, no_cache=True)
+        assert result["data"]["user_profile"]["user_id"] == 4014, result
+        assert len(ModuleStubHandler.requests) == 2
+        assert server_py39.retry_stats.retries == retries + 1
+        print("✅ 503 urmat de succes: o reîncercare, rezultat corect")
+        
+        waits = server_py39.retry_stats.retry_after_waits
+        ModuleStubHandler.statuses, ModuleStubHandler.retry_after = [503], "1"
+        started = time.monotonic()
+        result = await get_student_data(4014, user_profile=True, no_cache=True)
+        assert "error" not in result, result
+        assert time.monotonic() - started >= 0.9
+        assert server_py39.retry_stats.retry_after_waits == waits + 1
+        print("✅ Retry-After: reîncercarea a așteptat cât a cerut serverul")
+        
+        # Breaker dedicat testului: se deschide după 2 eșecuri, proba după 0.3s; limitatorul
+        # nou nu ține cererile la coadă, deci a doua cerere ajunge la breaker odată cu proba
+        ModuleStubHandler.retry_after = None
+        server_py39.RETRY_ATTEMPTS = 1
+        server_py39.api_breaker = server_py39.CircuitBreaker(failure_threshold=2, reset_timeout=0.3)
+        server_py39.api_limiter = server_py39.ApiLimiter(min_limit=4, max_limit=8)
+        ModuleStubHandler.statuses = [503, 503]
+        for user_id in (4015, 4016):
+            assert "error" in await get_student_data(user_id, user_profile=True, no_cache=True)
+        assert server_py39.api_breaker.state == "open"
+        sent = len(ModuleStubHandler.requests)
+        rejected = await get_student_data(4017, user_profile=True, no_cache=True)
+        assert "circuit breaker" in rejected["error"], rejected
+        assert len(ModuleStubHandler.requests) == sent, "Cu breaker-ul deschis nu pleacă nicio cerere"
+        print("✅ Breaker deschis după eșecuri consecutive: cererile eșuează local")
+        
+        await asyncio.sleep(0.35)
+        ModuleStubHandler.delay = 0.2
+        probe, other = await asyncio.gather(
+            get_student_data(4018, user_profile=True, no_cache=True),
+            get_student_data(4019, user_profile=True, no_cache=True)
+        )
+        assert "error" not in probe, probe
+        assert "circuit breaker" in other["error"], other
+        assert len(ModuleStubHandler.requests) == sent + 1, "Semi-deschis: o singură cerere de probă"
+        assert server_py39.api_breaker.state == "closed"
+        print("✅ Semi-deschis: o singură probă, reușita închide breaker-ul")
+    finally:
+        (server_py39.RETRY_BACKOFF_BASE, server_py39.RETRY_ATTEMPTS,
+         server_py39.api_breaker, server_py39.api_limiter) = original
+        for user_id in range(4014, 4020):
+            invalidate_cache(user_id)
+        await stop_module_stub(stub, original_base)
+
+async def test_limiter_cancellation():
+    """O cerere anulată cât așteaptă la coadă în limitator nu ocupă locul"""
+    print("🧪 Testez anularea cererilor aflate la coadă în limitator...")
+    
+    stub, original_base = start_module_stub()
+    original_limiter = server_py39.api_limiter
+    # Un singur loc de concurență: a doua și a treia cerere așteaptă la coadă
+    limiter = server_py39.api_limiter = server_py39.ApiLimiter(min_limit=1, max_limit=1)
+    ModuleStubHandler.delay = 0.3
+    try:
+        tasks = [asyncio.ensure_future(get_student_data(user_id, user_profile=True, no_cache=True))
+                 for user_id in (4020, 4021, 4022)]
+        await asyncio.sleep(0.1)
+        assert limiter.snapshot()["queued"] == 2, limiter.snapshot()
+        tasks[1].cancel()
+        await asyncio.sleep(0.05)
+        assert limiter.snapshot()["queued"] == 1, limiter.snapshot()
+        
+        first, cancelled, third = await asyncio.gather(*tasks, return_exceptions=True)
+        assert isinstance(cancelled, asyncio.CancelledError), cancelled
+        assert "error" not in first and "error" not in third, (first, third)
+        assert [int(query["user_id"]) for query in ModuleStubHandler.requests] == [4020, 4022]
+        assert limiter.in_flight == 0 and limiter.snapshot()["queued"] == 0, limiter.snapshot()
+        print("✅ Cererea anulată a ieșit din coadă; locul a trecut la următoarea")
+    finally:
+        server_py39.api_limiter = original_limiter
+        for user_id in (4020, 4021, 4022):
+            invalidate_cache(user_id)
+        await stop_module_stub(stub, original_base)
+
+async def test_deadline_partial():
+    """deadline_ms: răspuns parțial, modulele întârziate completează cache-ul pentru apelul următor"""
+    print("🧪 Testez răspunsurile parțiale cu deadline_ms...")
+    
+    stub, original_base = start_module_stub()
+    ModuleStubHandler.module_delay = {"analiza_lacunelor": 0.6}
+    ModuleStubHandler.module_status = {"progres_teorie": 404}
+    late_cached = server_py39.deadline_stats.late_cached
+    try:
+        started = time.monotonic()
+        first = await get_student_data(4060, user_profile=True, progres_teorie=True,
+                                       analiza_lacunelor=True, deadline_ms=200)
+        assert time.monotonic() - started < 0.5, "Răspunsul trebuia dat la termen"
+        assert first["metadata"]["missing_modules"] == ["analiza_lacunelor"], first["metadata"]
+        assert "404" in first["metadata"]["module_errors"]["progres_teorie"], first["metadata"]
+        assert "user_profile" in first["data"] and "analiza_lacunelor" not in first["data"], first["data"]
+        print("✅ Primul apel: user_profile la timp, analiza_lacunelor în missing_modules, progres_teorie în module_errors")
+        
+        await asyncio.sleep(0.7)
+        assert server_py39.deadline_stats.late_cached == late_cached + 1
+        sent = len(ModuleStubHandler.requests)
+        second = await get_student_data(4060, user_profile=True, analiza_lacunelor=True, deadline_ms=200)
+        assert second["metadata"]["missing_modules"] == [], second["metadata"]
+        assert "module_errors" not in second["metadata"], second["metadata"]
+        assert second["data"]["analiza_lacunelor"]["user_id"] == 4060, second["data"]
+        assert len(ModuleStubHandler.requests) == sent, "Al doilea apel trebuia servit din cache"
+        print("✅ Modulul întârziat a intrat în cache; al doilea apel este complet, fără cereri noi")
+    finally:
+        invalidate_cache(4060)
+        await stop_module_stub(stub, original_base)
+
+class StdioServer:
+    """server_py39 pornit ca proces separat și folosit prin stdin/stdout, ca de Claude Desktop"""
+    def __init__(self, **env: str):
+        self.env = {**os.environ, **env}
+        self.process = None
+    
+    async def start(self, protocol: str = "2025-06-18") -> "StdioServer":
+        code = (f"import asyncio, server_py39; server_py39.INTERNAL_API_BASE = {server_py39.INTERNAL_API_BASE!r}; "
+                f"asyncio.run(server_py39.main())")
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", code, cwd=os.path.dirname(os.path.abspath(__file__)), env=self.env,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        await self.send({"jsonrpc": "2.0", "id": 0, "method": "initialize",
+                         "params": {"protocolVersion": protocol}})
+        await self.receive()
+        return self
+    
+    async def send(self, message: Any) -> None:
+        self.process.stdin.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.process.stdin.drain()
+    
+    async def receive(self, timeout: float = 10.0) -> Any:
+        """Următorul mesaj de pe stdout; None dacă nu vine nimic în timeout secunde"""
+        try:
+            line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return json.loads(line)
+    
+    async def close(self) -> None:
+        self.process.stdin.close()
+        await self.process.wait()
+
+def tool_call(request_id: Any, name: str = "get_student_data", **arguments: Any) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": name, "arguments": arguments}}
+
+def cancel_notification(request_id: Any) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": request_id}}
+
+async def test_stdio_cancellation():
+    """Anularea ajunge la server și când toate sloturile de cereri sunt ocupate"""
+    print("🧪 Testez anularea prin stdio cu sloturile ocupate...")
+    
+    stub, original_base = start_module_stub()
+    ModuleStubHandler.delay = 1.0
+    server = await StdioServer(ACADEMIADEPOLITIE_MAX_CONCURRENT_REQUESTS="2").start()
+    try:
+        started = time.monotonic()
+        for request_id in (1, 2, 3):
+            await server.send(tool_call(request_id, user_id=4030 + request_id, user_profile=True))
+        await asyncio.sleep(0.3)
+        # Cererile 1 și 2 ocupă ambele sloturi, 3 așteaptă; 1 și 2 se anulează
+        await server.send(cancel_notification(1))
+        await server.send([cancel_notification(2)])
+        
+        response = await server.receive()
+        assert response["id"] == 3, response
+        assert time.monotonic() - started < 1.9, "Cererea 3 trebuia să pornească la anulare"
+        assert await server.receive(timeout=1.5) is None, "Cererile anulate nu primesc răspuns"
+        print("✅ Anulările au fost citite imediat; cererea din coadă a primit slotul")
+    finally:
+        await server.close()
+        await stop_module_stub(stub, original_base)
+
+async def test_stdio_batch():
+    """Batch-uri JSON-RPC prin stdio: erori, notificări și limita de cereri simultane"""
+    print("🧪 Testez batch-urile JSON-RPC prin stdio...")
+    
+    stub, original_base = start_module_stub()
+    ModuleStubHandler.delay = 0.3
+    server = await StdioServer(ACADEMIADEPOLITIE_MAX_CONCURRENT_REQUESTS="2").start()
+    notification = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+    try:
+        await server.send([])
+        response = await server.receive()
+        assert response["id"] is None and response["error"]["code"] == -32600, response
+        print("✅ Batch gol → un singur Invalid Request")
+        
+        await server.send([1, notification, {"jsonrpc": "2.0", "id": "list", "method": "tools/list"}])
+        response = await server.receive()
+        assert isinstance(response, list) and len(response) == 2, response
+        assert response[0]["error"]["code"] == -32600 and response[0]["id"] is None, response[0]
+        assert response[1]["id"] == "list" and response[1]["result"]["tools"], response[1]
+        print("✅ Membru invalid → Invalid Request; notificarea nu primește răspuns; un singur array")
+        
+        # Un batch doar cu notificări nu scrie nimic: următorul mesaj este răspunsul la tools/list
+        await server.send([notification, notification])
+        await server.send({"jsonrpc": "2.0", "id": "după", "method": "tools/list"})
+        response = await server.receive()
+        assert isinstance(response, dict) and response["id"] == "după", response
+        print("✅ Batch format doar din notificări → niciun răspuns")
+        
+        # 4 apeluri de câte 0.3s cu 2 sloturi: două runde, nu una
+        started = time.monotonic()
+        await server.send([tool_call(index, user_id=4050 + index, user_profile=True) for index in range(4)])
+        response = await server.receive()
+        elapsed = time.monotonic() - started
+        assert sorted(item["id"] for item in response) == [0, 1, 2, 3], response
+        assert all("result" in item for item in response), response
+        assert 0.6 <= elapsed < 1.2, f"Membrii trebuiau limitați la 2 simultan ({elapsed:.2f}s)"
+        print(f"✅ Membrii batch-ului respectă MAX_CONCURRENT_REQUESTS ({elapsed:.2f}s pentru 2 runde)")
+    finally:
+        await server.close()
+        await stop_module_stub(stub, original_base)
+
+async def test_stdio_fanout_progress():
+    """all_modules cu fan-out: o cerere pe modul și notifications/progress la sosirea fiecăruia"""
+    print("🧪 Testez fan-out-ul all_modules și notificările de progres prin stdio...")
+    
+    stub, original_base = start_module_stub()
+    ModuleStubHandler.module_delay = {"user_profile": 0.1, "analiza_lacunelor": 0.4}
+    server = await StdioServer(ACADEMIADEPOLITIE_ALL_MODULES_FANOUT="1").start()
+    try:
+        request = tool_call(1, user_id=4070, all_modules=True)
+        request["params"]["_meta"] = {"progressToken": "fanout"}
+        started = time.monotonic()
+        await server.send(request)
+        progress = []
+        while True:
+            message = await server.receive()
+            assert message is not None, "Lipsește răspunsul la tools/call"
+            if message.get("method") != "notifications/progress":
+                break
+            progress.append(message["params"])
+        elapsed = time.monotonic() - started
+        
+        assert message["id"] == 1 and "result" in message, message
+        assert not any("all" in query for query in ModuleStubHandler.requests), ModuleStubHandler.requests
+        total = len(ModuleStubHandler.requests)
+        assert total > 1, "all_modules trebuia împărțit în cereri pe module"
+        print(f"✅ all_modules împărțit în {total} cereri paralele ({elapsed:.2f}s, cel mai lent modul 0.4s)")
+        
+        assert all(item["progressToken"] == "fanout" and item["total"] == total for item in progress), progress
+        assert [item["progress"] for item in progress] == list(range(1, total + 1)), progress
+        assert progress[-1]["message"].endswith("analiza_lacunelor"), progress[-1]
+        assert elapsed < 0.9, "Modulele trebuiau cerute în paralel"
+        print(f"✅ {len(progress)} notificări de progres înaintea rezultatului, ultima pentru modulul cel mai lent")
+    finally:
+        await server.close()
+        await stop_module_stub(stub, original_base)
+
+async def test_disk_cache():
+    """Cache-ul persistent: permisiuni, evacuare după mărime, dezactivare la eroare, partajare între procese"""
+    print("🧪 Testez cache-ul persistent SQLite...")
+    
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "nou", "cache.sqlite3")
+        cache = server_py39.DiskCache(path, max_bytes=1000)
+        keys = [(("user_id", 4080 + index), ("user_profile", 1)) for index in range(5)]
+        try:
+            for key in keys:
+                cache.store(key, {"user_profile": {"nume": "x" * 280}}, ttl=60, max_stale=0)
+            rows = await cache.load(keys)
+            if os.name == "posix":
+                assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+                assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+                print("✅ Director 0700 și bază de date 0600")
+        finally:
+            cache.close()
+        # Intrări de ~300 de octeți sub o limită de 1000: rămân cele mai recente, sub limită
+        loaded = [row[0] for row in rows]
+        assert keys[-1] in loaded and keys[0] not in loaded, loaded
+        assert len(loaded) * 300 <= 1000, loaded
+        print(f"✅ Evacuare după mărime: {len(loaded)} din {len(keys)} intrări păstrate, cele mai recente")
+        
+        corrupt = os.path.join(directory, "corupt.sqlite3")
+        with open(corrupt, "wb") as f:
+            f.write(b"nu este o baza de date SQLite" * 100)
+        cache = server_py39.DiskCache(corrupt)
+        try:
+            cache.store(keys[0], {"user_profile": {}}, ttl=60, max_stale=0)
+            assert await cache.load(keys) == [] and not cache.enabled
+        finally:
+            cache.close()
+        print("✅ Eroare SQLite → cache-ul persistent se dezactivează, cererile continuă")
+        
+        # Două procese server cu același fișier; TTL 1s ca vârsta să se vadă la un al treilea proces
+        stub, original_base = start_module_stub()
+        env = {"ACADEMIADEPOLITIE_DISK_CACHE": os.path.join(directory, "partajat.sqlite3"),
+               "ACADEMIADEPOLITIE_CACHE_TTL_USER_PROFILE": "1"}
+        try:
+            first, second = await StdioServer(**env).start(), await StdioServer(**env).start()
+            try:
+                await first.send(tool_call(1, user_id=4090, user_profile=True))
+                await first.receive()
+                fetched_at = time.monotonic()
+                await asyncio.sleep(0.3)
+                await second.send(tool_call(1, user_id=4090, user_profile=True))
+                response = (await second.receive())["result"]["structuredContent"]
+                assert len(ModuleStubHandler.requests) == 1, ModuleStubHandler.requests
+                assert response["data"]["user_profile"]["user_id"] == 4090, response
+                print("✅ Al doilea proces a servit răspunsul din fișierul comun, fără cerere la API")
+            finally:
+                await first.close()
+                await second.close()
+            
+            await asyncio.sleep(max(0.0, fetched_at + 1.5 - time.monotonic()))
+            third = await StdioServer(**env).start()
+            try:
+                await third.send(tool_call(1, user_id=4090, user_profile=True))
+                metadata = (await third.receive())["result"]["structuredContent"]["metadata"]
+                assert metadata.get("cache_stale") and metadata["cache_age_seconds"] >= 1.5, metadata
+                print(f"✅ Vârsta intrării se păstrează la reîncărcare ({metadata['cache_age_seconds']}s, învechită)")
+            finally:
+                await third.close()
+        finally:
+            await stop_module_stub(stub, original_base)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
 
 async def test_all_features():
     """Testează toate funcționalitățile serverului"""
@@ -62,7 +637,19 @@ async def test_all_features():
         except Exception as e:
             print(f"❌ Exception: {e}")
     
+    await close_http_client()
     print("\n🎉 Teste complete!")
 
 if __name__ == "__main__":
+    asyncio.run(test_conditional_requests())
+    asyncio.run(test_widening_fallback())
+    asyncio.run(test_cache_subsumption())
+    asyncio.run(test_fields_projection())
+    asyncio.run(test_retries_and_breaker())
+    asyncio.run(test_limiter_cancellation())
+    asyncio.run(test_deadline_partial())
+    asyncio.run(test_stdio_cancellation())
+    asyncio.run(test_stdio_batch())
+    asyncio.run(test_stdio_fanout_progress())
+    asyncio.run(test_disk_cache())
     asyncio.run(test_all_features())
\ No newline at end of file
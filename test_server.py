@@ -5,7 +5,92 @@ Test script pentru MCP server cu toți parametrii
 
 import asyncio
 import json
-from server import get_student_data
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+import httpx
+import server
+import server_py39
+from server import get_student_data, close_http_client, invalidate_cache, request_internal_api_once
+from server_py39 import HTTPError
+# Backend-urile locale sunt aceleași ca pentru nucleul comun
+from test_py39 import ConditionalStubHandler, ModuleStubHandler, start_module_stub, stop_module_stub
+
+async def test_conditional_requests():
+    """Testează revalidarea cu ETag / 304 prin transportul httpx"""
+    print("🧪 Testez cererile condiționate (ETag / If-None-Match) prin httpx...")
+    
+    ConditionalStubHandler.etag, ConditionalStubHandler.served = '"v1"', {200: 0, 304: 0}
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), ConditionalStubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    original_base = server_py39.INTERNAL_API_BASE
+    server_py39.INTERNAL_API_BASE = f"http://127.0.0.1:{stub.server_address[1]}"
+    invalidate_cache(4001)
+    
+    try:
+        first = await request_internal_api_once({"user_id": 4001, "user_profile": 1})
+        assert not first.not_modified and first.validators == {"etag": '"v1"'}, first.validators
+        second = await request_internal_api_once({"user_id": 4001, "user_profile": 1}, first.validators)
+        assert second.not_modified and second.data is None
+        assert second.validators == {"etag": '"v1"'}, second.validators
+        print("✅ httpx: 304 Not Modified întoarce validatorii, fără corp")
+        
+        # Prin get_student_data: la 304 se refolosește obiectul din cache
+        first = await get_student_data(4001, user_profile=True, no_cache=True)
+        second = await get_student_data(4001, user_profile=True, no_cache=True)
+        assert ConditionalStubHandler.served == {200: 2, 304: 2}, ConditionalStubHandler.served
+        assert second["data"] is first["data"], "La 304 trebuie refolosit obiectul din cache"
+        print("✅ 304 Not Modified: corpul din cache a fost refolosit")
+    finally:
+        server_py39.INTERNAL_API_BASE = original_base
+        invalidate_cache(4001)
+        stub.shutdown()
+        await close_http_client()
+
+async def test_error_translation():
+    """Erorile httpx devin HTTPError / ConnectionError / asyncio.TimeoutError, ca în nucleu"""
+    print("🧪 Testez traducerea erorilor httpx...")
+    
+    params = {"user_id": 4040, "user_profile": 1}
+    stub, original_base = start_module_stub()
+    original_timeout = server.HTTP_TIMEOUT
+    try:
+        ModuleStubHandler.statuses, ModuleStubHandler.retry_after = [503], "2"
+        try:
+            await request_internal_api_once(params)
+            raise AssertionError("503 trebuia să ridice HTTPError")
+        except HTTPError as e:
+            assert e.status == 503 and e.headers.get("retry-after") == "2", (e.status, e.headers)
+        print("✅ Status 503 → HTTPError, cu header-ele păstrate (Retry-After)")
+        
+        # Timeout de citire: backend-ul răspunde după 0.5s, clientul așteaptă 0.1s
+        await close_http_client()
+        server.HTTP_TIMEOUT = httpx.Timeout(0.1)
+        ModuleStubHandler.delay = 0.5
+        try:
+            await request_internal_api_once(params)
+            raise AssertionError("Timeout-ul de citire trebuia să ridice asyncio.TimeoutError")
+        except asyncio.TimeoutError:
+            pass
+        print("✅ Timeout de citire → asyncio.TimeoutError")
+    finally:
+        server.HTTP_TIMEOUT = original_timeout
+        await stop_module_stub(stub, original_base)
+        await close_http_client()
+    
+    # Port pe care nu ascultă nimeni: conexiunea este refuzată
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server_py39.INTERNAL_API_BASE = f"http://127.0.0.1:{port}"
+    try:
+        await request_internal_api_once(params)
+        raise AssertionError("Conexiunea refuzată trebuia să ridice ConnectionError")
+    except ConnectionError:
+        print("✅ Conexiune refuzată → ConnectionError")
+    finally:
+        server_py39.INTERNAL_API_BASE = original_base
+        await close_http_client()
 
 async def test_tools():
     """Testează get_student_data cu toți parametrii"""
@@ -67,7 +152,10 @@ async def test_tools():
     except Exception as e:
         print(f"❌ Error: {e}")
     
+    await close_http_client()
     print("\n🎉 Test complet cu toți parametrii!")
 
 if __name__ == "__main__":
-    asyncio.run(test_tools())
\ No newline at end of file
+    asyncio.run(test_conditional_requests())
+    asyncio.run(test_error_translation())
+    asyncio.run(test_tools())